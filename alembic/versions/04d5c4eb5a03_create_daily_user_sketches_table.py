@@ -0,0 +1,30 @@
+"""create daily_user_sketches table
+
+Revision ID: 04d5c4eb5a03
+Revises: 2bc79697a8fa
+Create Date: 2026-10-18 08:38:01.484118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '04d5c4eb5a03'
+down_revision: Union[str, None] = '2bc79697a8fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('daily_user_sketches',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('country', sa.String(), server_default='', nullable=False),
+    sa.Column('registers', sa.LargeBinary(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'country')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_user_sketches')
@@ -0,0 +1,31 @@
+"""create user_first_seen table
+
+Revision ID: 1d3784002f97
+Revises: a96fb74c70f3
+Create Date: 2026-10-18 08:35:19.045053
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '1d3784002f97'
+down_revision: Union[str, None] = 'a96fb74c70f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_first_seen',
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.Column('first_seen', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index(op.f('ix_user_first_seen_first_seen'), 'user_first_seen', ['first_seen'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_user_first_seen_first_seen'), table_name='user_first_seen')
+    op.drop_table('user_first_seen')
@@ -0,0 +1,37 @@
+"""create daily rollup tables
+
+Revision ID: 2bc79697a8fa
+Revises: 1d3784002f97
+Create Date: 2026-10-18 08:36:49.587650
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '2bc79697a8fa'
+down_revision: Union[str, None] = '1d3784002f97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('daily_event_counts',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('event_type', sa.String(), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'event_type')
+    )
+    op.create_table('daily_user_activity',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('country', sa.String(), server_default='', nullable=False),
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'country', 'user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_user_activity')
+    op.drop_table('daily_event_counts')
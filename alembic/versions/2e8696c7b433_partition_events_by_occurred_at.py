@@ -0,0 +1,102 @@
+"""partition events by occurred_at
+
+Revision ID: 2e8696c7b433
+Revises: 04d5c4eb5a03
+Create Date: 2026-10-18 08:39:47.979927
+
+"""
+import os
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '2e8696c7b433'
+down_revision: Union[str, None] = '04d5c4eb5a03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Partition layout as of this revision, kept here so the migration does not follow app.partitions.
+PARTITION_INTERVAL = os.getenv("EVENTS_PARTITION_INTERVAL", "month")
+DEFAULT_PARTITION = "events_default"
+
+
+def partition_bounds(day):
+    if PARTITION_INTERVAL == "day":
+        return day, day + timedelta(days=1)
+    if PARTITION_INTERVAL == "month":
+        start = day.replace(day=1)
+        return start, date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    raise ValueError(f"Unsupported partition interval: {PARTITION_INTERVAL}")
+
+
+def partition_name(start):
+    if PARTITION_INTERVAL == "day":
+        return f"events_p{start:%Y_%m_%d}"
+    return f"events_p{start:%Y_%m}"
+
+
+INDEXES = [
+    ('ix_events_occurred_at', ['occurred_at']),
+    ('ix_events_user_id_occurred_at', ['user_id', 'occurred_at']),
+    ('ix_events_event_type_occurred_at', ['event_type', 'occurred_at']),
+    ('ix_events_country', [sa.text("(properties ->> 'country')")]),
+]
+
+
+def upgrade() -> None:
+    op.rename_table('events', 'events_unpartitioned')
+    op.execute('ALTER TABLE events_unpartitioned RENAME CONSTRAINT events_pkey TO events_unpartitioned_pkey')
+
+    op.create_table('events',
+    sa.Column('event_id', sa.UUID(), nullable=False),
+    sa.Column('occurred_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.Column('event_type', sa.String(), nullable=False),
+    sa.Column('properties', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.PrimaryKeyConstraint('event_id', 'occurred_at'),
+    postgresql_partition_by='RANGE (occurred_at)'
+    )
+    op.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF events DEFAULT')
+
+    bind = op.get_bind()
+    first_day, last_day = bind.execute(sa.text(
+        'SELECT min(occurred_at)::date, max(occurred_at)::date FROM events_unpartitioned'
+    )).one()
+    today = date.today()
+    start = partition_bounds(first_day or today)[0]
+    last_start = partition_bounds(max(last_day or today, today))[0]
+    while start <= last_start:
+        end = partition_bounds(start)[1]
+        op.execute(f"CREATE TABLE {partition_name(start)} PARTITION OF events FOR VALUES FROM ('{start}') TO ('{end}')")
+        start = end
+
+    for name, columns in INDEXES:
+        op.create_index(name, 'events', columns, unique=False)
+
+    op.create_table('event_ids',
+    sa.Column('event_id', sa.UUID(), nullable=False),
+    sa.PrimaryKeyConstraint('event_id')
+    )
+    op.execute('INSERT INTO events SELECT event_id, occurred_at, user_id, event_type, properties FROM events_unpartitioned')
+    op.execute('INSERT INTO event_ids SELECT event_id FROM events_unpartitioned')
+    op.drop_table('events_unpartitioned')
+
+
+def downgrade() -> None:
+    op.create_table('events_unpartitioned',
+    sa.Column('event_id', sa.UUID(), nullable=False),
+    sa.Column('occurred_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.Column('event_type', sa.String(), nullable=False),
+    sa.Column('properties', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+    op.execute('INSERT INTO events_unpartitioned SELECT event_id, occurred_at, user_id, event_type, properties FROM events')
+    op.drop_table('event_ids')
+    op.drop_table('events')
+    op.rename_table('events_unpartitioned', 'events')
+    op.create_primary_key('events_pkey', 'events', ['event_id'])
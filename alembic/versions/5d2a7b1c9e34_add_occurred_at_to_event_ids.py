@@ -0,0 +1,28 @@
+"""add occurred_at to event_ids
+
+Revision ID: 5d2a7b1c9e34
+Revises: b3e91d2c6f08
+Create Date: 2026-10-18 10:12:05.418337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2a7b1c9e34'
+down_revision: Union[str, None] = 'b3e91d2c6f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('event_ids', sa.Column('occurred_at', sa.TIMESTAMP(), nullable=True))
+    op.execute('UPDATE event_ids i SET occurred_at = e.occurred_at FROM events e WHERE e.event_id = i.event_id')
+    op.create_index('ix_event_ids_occurred_at', 'event_ids', ['occurred_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_event_ids_occurred_at', table_name='event_ids')
+    op.drop_column('event_ids', 'occurred_at')
@@ -0,0 +1,44 @@
+"""promote event properties to columns
+
+Revision ID: 7c1f0e9a4b52
+Revises: 2e8696c7b433
+Create Date: 2026-10-18 09:05:12.318442
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1f0e9a4b52'
+down_revision: Union[str, None] = '2e8696c7b433'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PROMOTED = ['country', 'session_id']
+
+
+def upgrade() -> None:
+    for key in PROMOTED:
+        op.add_column('events', sa.Column(key, sa.String(), nullable=True))
+    op.execute(
+        'UPDATE events SET ' + ', '.join(f"{key} = properties ->> '{key}'" for key in PROMOTED) +
+        ' WHERE properties ?| array[' + ', '.join(f"'{key}'" for key in PROMOTED) + ']'
+    )
+
+    op.drop_index('ix_events_country', table_name='events')
+    op.create_index('ix_events_country_occurred_at', 'events', ['country', 'occurred_at'], unique=False)
+    op.create_index('ix_events_session_id', 'events', ['session_id'], unique=False)
+    op.create_index('ix_events_properties', 'events', ['properties'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'properties': 'jsonb_path_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_properties', table_name='events')
+    op.drop_index('ix_events_session_id', table_name='events')
+    op.drop_index('ix_events_country_occurred_at', table_name='events')
+    op.create_index('ix_events_country', 'events', [sa.text("(properties ->> 'country')")], unique=False)
+    for key in reversed(PROMOTED):
+        op.drop_column('events', key)
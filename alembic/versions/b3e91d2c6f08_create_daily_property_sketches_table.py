@@ -0,0 +1,30 @@
+"""create daily_property_sketches table
+
+Revision ID: b3e91d2c6f08
+Revises: 7c1f0e9a4b52
+Create Date: 2026-10-18 09:41:27.905113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e91d2c6f08'
+down_revision: Union[str, None] = '7c1f0e9a4b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('daily_property_sketches',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('property', sa.String(), nullable=False),
+    sa.Column('counters', sa.LargeBinary(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'property')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_property_sketches')
@@ -1,128 +1,753 @@
-from fastapi import APIRouter, Query, HTTPException
-from sqlalchemy import func, select
-from app.database import SessionLocal
-from app.models import Event
-from datetime import datetime, timedelta
-import logging
+import contextvars
+import inspect
 import json
+import os
+import re
+from collections import Counter
+from statistics import median
 
-logger = logging.getLogger("analytics")
-logger.setLevel(logging.INFO)
+from fastapi import APIRouter, Body, Depends, Query, HTTPException, Request
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from sqlalchemy import func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import analytics_cache, days_between
+from app.database import get_db
+from app.heavy_hitters import TOP_VALUES_PROPERTIES, SpaceSaving
+from app.hll import HyperLogLog
+from app.hot_window import hot_window
+from app.logging_setup import get_logger
+from app.metrics import STATS_QUERY_SECONDS
+from app.models import (
+    PROMOTED_PROPERTIES, Event, UserFirstSeen, DailyEventCount, DailyUserActivity, DailyUserSketch, DailyPropertySketch
+)
+from datetime import datetime, timedelta
 
-formatter = logging.Formatter(json.dumps({
-    "time": "%(asctime)s",
-    "level": "%(levelname)s",
-    "endpoint": "%(message)s"
-}))
+logger = get_logger("analytics", "logs/analytics.log")
 
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
+analytics_router = APIRouter(tags=["analytics"])
 
-file_handler = logging.FileHandler("logs/analytics.log")
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
+FUNNEL_MAX_STEPS = int(os.getenv("FUNNEL_MAX_STEPS", "10"))
+FUNNEL_FETCH_ROWS = int(os.getenv("FUNNEL_FETCH_ROWS", "10000"))
+FUNNEL_MAX_WITHIN_DAYS = int(os.getenv("FUNNEL_MAX_WITHIN_DAYS", "90"))
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+STATS_BATCH_MAX_QUERIES = int(os.getenv("STATS_BATCH_MAX_QUERIES", "20"))
 
-analytics_router = APIRouter(tags=["analytics"])
+# Events slices that several queries of one POST /stats/batch read: key -> summary (None until scanned).
+_shared_slices = contextvars.ContextVar("shared_slices", default=None)
 
 
-@analytics_router.get("/dau")
-def get_dau(from_date: str = Query(...), to_date: str = Query(...), country: str = Query(None, description="Filter by country, e.g., UA")):
-    if from_date > to_date:
+def _parse_date(value, name):
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"'{name}' must be a date in YYYY-MM-DD format")
+
+
+def _parse_range(from_date, to_date):
+    from_dt = _parse_date(from_date, "from_date")
+    to_dt = _parse_date(to_date, "to_date")
+    if from_dt > to_dt:
         raise HTTPException(status_code=400, detail="'from_date' must be before 'to_date'")
+    return from_dt, to_dt
+
+
+def _parse_duration(value, name, max_days):
+    match = re.fullmatch(r"(\d+)([smhd])", value.strip())
+    if not match or int(match.group(1)) == 0:
+        raise HTTPException(status_code=400, detail=f"'{name}' must be a duration like 30m, 12h or 7d")
+    seconds = int(match.group(1)) * DURATION_UNITS[match.group(2)]
+    if seconds > max_days * 86400:
+        raise HTTPException(status_code=400, detail=f"'{name}' must be at most {max_days}d")
+    return timedelta(seconds=seconds)
+
+
+def property_filters(request: Request):
+    """`?prop.<key>=<value>` query parameters as {key: value}."""
+    filters = {}
+    for name, value in request.query_params.items():
+        if name.startswith("prop."):
+            key = name[len("prop."):]
+            if not key:
+                raise HTTPException(status_code=400, detail="Property filters look like prop.<key>=<value>")
+            filters[key] = value
+    return filters
+
+
+def _with_country(props, country):
+    return {**props, "country": country} if country else props
+
+
+def _country_only(props):
+    # The rollups, sketches and hot window are keyed by country only.
+    return set(props) <= {"country"}
+
 
-    session = SessionLocal()
+def _props_key(props):
+    return tuple(sorted(props.items()))
+
+
+def _property_clause(key, value):
+    column = PROMOTED_PROPERTIES.get(key)
+    if column is not None:
+        return column == value
+
+    # Query values are strings; also match JSON numbers and booleans (prop.qty=2 matches {"qty": 2}).
+    candidates = [value]
     try:
+        parsed = json.loads(value)
+    except ValueError:
+        parsed = None
+    if isinstance(parsed, (bool, int, float)):
+        candidates.append(parsed)
+    return or_(*[Event.properties.contains({key: candidate}) for candidate in candidates])
+
+
+def _event_filters(from_dt, to_dt, props):
+    start = datetime.combine(from_dt, datetime.min.time())
+    end = datetime.combine(to_dt + timedelta(days=1), datetime.min.time())
+    return [
+        Event.occurred_at >= start,
+        Event.occurred_at < end,
+        *[_property_clause(key, value) for key, value in sorted(props.items())],
+    ]
+
+
+def _slice_key(from_dt, to_dt, props):
+    return from_dt, to_dt, _props_key(props)
+
+
+async def _scan_slice(session, from_dt, to_dt, props):
+    """DAU, active users and per-type counts of one events slice from a single scan (GROUPING SETS)."""
+    day = func.date(Event.occurred_at)
+    query = (
+        select(
+            day.label("day"),
+            Event.event_type,
+            func.grouping(day, Event.event_type).label("level"),
+            func.count(func.distinct(Event.user_id)).label("users"),
+            func.count().label("events"),
+        )
+        .where(*_event_filters(from_dt, to_dt, props))
+        .group_by(func.grouping_sets(tuple_(day), tuple_(Event.event_type), tuple_()))
+    )
+    dau, event_counts, active_users = [], [], 0
+    for r in await session.execute(query):
+        if r.level == 1:
+            dau.append({"day": r.day.strftime("%Y-%m-%d"), "dau": r.users})
+        elif r.level == 2:
+            event_counts.append({"event_type": r.event_type, "count": r.events})
+        else:
+            active_users = r.users
+    dau.sort(key=lambda row: row["day"])
+    event_counts.sort(key=lambda row: (-row["count"], row["event_type"]))
+    return {"dau": dau, "active_users": active_users, "top_events": event_counts}
+
+
+async def _shared_slice(session, from_dt, to_dt, props):
+    shared = _shared_slices.get()
+    key = _slice_key(from_dt, to_dt, props)
+    if shared is None or key not in shared:
+        return None
+    if shared[key] is None:
+        shared[key] = await _scan_slice(session, from_dt, to_dt, props)
+    return shared[key]
+
+
+async def _filtered_cohorts(session, from_dt, to_dt, windows, props):
+    """Cohorts first seen in [from_dt, to_dt] with a matching event on day 0, and their matching returns."""
+    active = (
+        select(Event.user_id, UserFirstSeen.first_seen, func.date(Event.occurred_at).label("day"))
+        .join(UserFirstSeen, UserFirstSeen.user_id == Event.user_id)
+        .where(UserFirstSeen.first_seen.between(from_dt, to_dt))
+        .where(*_event_filters(from_dt, to_dt + timedelta(days=windows), props))
+        .distinct()
+        .cte("active")
+    )
+    members = select(active.c.user_id).where(active.c.day == active.c.first_seen)
+    sizes_query = (
+        select(active.c.first_seen, func.count().label("size"))
+        .where(active.c.day == active.c.first_seen)
+        .group_by(active.c.first_seen)
+    )
+    sizes = {r.first_seen: r.size for r in await session.execute(sizes_query)}
+
+    day_offset = (active.c.day - active.c.first_seen).label("day")
+    returning_query = (
+        select(active.c.first_seen, day_offset, func.count().label("returning_users"))
+        .where(active.c.user_id.in_(members))
+        .where(day_offset.between(1, windows))
+        .group_by(active.c.first_seen, day_offset)
+    )
+    returning = {(r.first_seen, r.day): r.returning_users for r in await session.execute(returning_query)}
+    return sizes, returning
+
+
+class FunnelCounter:
+    """Per-user state machine fed with events ordered by (user_id, occurred_at).
+
+    The user's first steps[0] before anchor_end starts the funnel; every next step must follow the
+    previous one and happen within `within` of the start.
+    """
+
+    def __init__(self, steps, within, anchor_end):
+        self.steps = steps
+        self.within = within
+        self.anchor_end = anchor_end
+        self.users = [0] * len(steps)
+        self.seconds = [[] for _ in steps]
+        self._user = None
+        self._stage = self._start = self._last = None
+
+    def add(self, user_id, occurred_at, event_type):
+        if user_id != self._user:
+            self._user, self._stage, self._start, self._last = user_id, 0, None, None
+        stage = self._stage
+        if stage == len(self.steps) or event_type != self.steps[stage]:
+            return
+
+        if stage == 0:
+            if occurred_at >= self.anchor_end:
+                return
+            self._start = occurred_at
+        elif occurred_at - self._start > self.within:
+            self._stage = len(self.steps)
+            return
+        else:
+            self.seconds[stage].append((occurred_at - self._last).total_seconds())
+
+        self.users[stage] += 1
+        self._last = occurred_at
+        self._stage = stage + 1
+
+    def result(self):
+        first = self.users[0]
+        return [
+            {
+                "event_type": step,
+                "users": users,
+                "conversion": round(users / first, 4) if first else 0.0,
+                "median_seconds_from_previous": median(seconds) if seconds else None,
+            }
+            for step, users, seconds in zip(self.steps, self.users, self.seconds)
+        ]
+
+
+def _timed(endpoint, compute):
+    async def timed():
+        with STATS_QUERY_SECONDS.labels(endpoint=endpoint).time():
+            return await compute()
+    return timed
+
+
+async def _daily_sketches(session, from_dt, to_dt, country):
+    query = (
+        select(DailyUserSketch.day, DailyUserSketch.registers)
+        .where(DailyUserSketch.day.between(from_dt, to_dt))
+    )
+    if country:
+        query = query.where(DailyUserSketch.country == country)
+
+    sketches = {}
+    for day, registers in await session.execute(query):
+        sketch = HyperLogLog.from_bytes(registers)
+        if day in sketches:
+            sketches[day].merge(sketch)
+        else:
+            sketches[day] = sketch
+    return sketches
+
+
+@analytics_router.get("/dau")
+async def get_dau(
+    from_date: str = Query(...),
+    to_date: str = Query(...),
+    country: str = Query(None, description="Filter by country, e.g., UA"),
+    approx: bool = Query(False, description="Estimate from HyperLogLog sketches (~1.6% standard error)"),
+    props: dict = Depends(property_filters),
+    session: AsyncSession = Depends(get_db)
+):
+    from_dt, to_dt = _parse_range(from_date, to_date)
+    props = _with_country(props, country)
+    if approx and not _country_only(props):
+        raise HTTPException(status_code=400, detail="'approx' supports only the country filter")
+    country = props.get("country")
+
+    async def compute():
+        if approx:
+            sketches = await _daily_sketches(session, from_dt, to_dt, country)
+            return [{"day": day.strftime("%Y-%m-%d"), "dau": sketches[day].count()} for day in sorted(sketches)]
+
+        if not _country_only(props):
+            shared = await _shared_slice(session, from_dt, to_dt, props)
+            if shared is not None:
+                return shared["dau"]
+            day = func.date(Event.occurred_at).label("day")
+            query = (
+                select(day, func.count(func.distinct(Event.user_id)).label("dau"))
+                .where(*_event_filters(from_dt, to_dt, props))
+                .group_by(day)
+                .order_by(day)
+            )
+            return [{"day": r.day.strftime("%Y-%m-%d"), "dau": r.dau} for r in await session.execute(query)]
+
+        daily = hot_window.dau(from_dt, to_dt, country)
+        if daily is not None:
+            return [{"day": day.strftime("%Y-%m-%d"), "dau": dau} for day, dau in daily]
+
         query = (
             select(
-                func.date_trunc('day', Event.occurred_at).label("day"),
-                func.count(func.distinct(Event.user_id)).label("dau")
+                DailyUserActivity.day,
+                func.count(func.distinct(DailyUserActivity.user_id)).label("dau")
             )
-            .where(Event.occurred_at >= from_date)
-            .where(Event.occurred_at <= to_date)
+            .where(DailyUserActivity.day.between(from_dt, to_dt))
         )
 
         if country:
-            query = query.where(Event.properties["country"].astext == country)
+            query = query.where(DailyUserActivity.country == country)
 
-        query = query.group_by("day").order_by("day")
+        query = query.group_by(DailyUserActivity.day).order_by(DailyUserActivity.day)
 
-        results = session.execute(query).all()
-        logger.info(f'/dau called with from={from_date}, to={to_date}, results={len(results)}')
+        results = (await session.execute(query)).all()
         return [{"day": r.day.strftime("%Y-%m-%d"), "dau": r.dau} for r in results]
-    finally:
-        session.close()
+
+    results = await analytics_cache.get_or_compute(
+        ("dau", from_dt, to_dt, approx, _props_key(props)), days_between(from_dt, to_dt), _timed("dau", compute)
+    )
+    logger.info("/dau called with from=%s, to=%s, approx=%s, results=%d", from_date, to_date, approx, len(results))
+    return results
+
+
+@analytics_router.get("/active-users")
+async def get_active_users(
+    from_date: str = Query(...),
+    to_date: str = Query(...),
+    country: str = Query(None, description="Filter by country, e.g., UA"),
+    approx: bool = Query(False, description="Estimate from HyperLogLog sketches (~1.6% standard error)"),
+    props: dict = Depends(property_filters),
+    session: AsyncSession = Depends(get_db)
+):
+    from_dt, to_dt = _parse_range(from_date, to_date)
+    props = _with_country(props, country)
+    if approx and not _country_only(props):
+        raise HTTPException(status_code=400, detail="'approx' supports only the country filter")
+    country = props.get("country")
+
+    async def compute():
+        if approx:
+            merged = HyperLogLog()
+            for sketch in (await _daily_sketches(session, from_dt, to_dt, country)).values():
+                merged.merge(sketch)
+            return merged.count()
+
+        if not _country_only(props):
+            shared = await _shared_slice(session, from_dt, to_dt, props)
+            if shared is not None:
+                return shared["active_users"]
+            query = select(func.count(func.distinct(Event.user_id))).where(*_event_filters(from_dt, to_dt, props))
+            return (await session.execute(query)).scalar()
+
+        query = (
+            select(func.count(func.distinct(DailyUserActivity.user_id)))
+            .where(DailyUserActivity.day.between(from_dt, to_dt))
+        )
+        if country:
+            query = query.where(DailyUserActivity.country == country)
+        return (await session.execute(query)).scalar()
+
+    users = await analytics_cache.get_or_compute(
+        ("active-users", from_dt, to_dt, approx, _props_key(props)),
+        days_between(from_dt, to_dt),
+        _timed("active-users", compute),
+    )
+    logger.info("/active-users called with from=%s, to=%s, approx=%s, users=%d", from_date, to_date, approx, users)
+    return {"from_date": from_date, "to_date": to_date, "active_users": users}
 
 
 @analytics_router.get("/top-events")
-def get_top_events(
+async def get_top_events(
     from_date: str = Query(..., description="Start date in YYYY-MM-DD format"),
     to_date: str = Query(..., description="End date in YYYY-MM-DD format"),
-    limit: int = Query(10, description="Maximum number of events to return")
+    limit: int = Query(10, description="Maximum number of events to return"),
+    props: dict = Depends(property_filters),
+    session: AsyncSession = Depends(get_db)
 ):
     if limit <= 0:
         raise HTTPException(status_code=400, detail="Limit must be greater than 0")
+    from_dt, to_dt = _parse_range(from_date, to_date)
+
+    async def compute():
+        if props:
+            shared = await _shared_slice(session, from_dt, to_dt, props)
+            if shared is not None:
+                return shared["top_events"][:limit]
+            count = func.count().label("cnt")
+            query = (
+                select(Event.event_type, count)
+                .where(*_event_filters(from_dt, to_dt, props))
+                .group_by(Event.event_type)
+                .order_by(count.desc(), Event.event_type)
+                .limit(limit)
+            )
+            return [{"event_type": r.event_type, "count": r.cnt} for r in await session.execute(query)]
+
+        top = hot_window.top_events(from_dt, to_dt, limit)
+        if top is not None:
+            return [{"event_type": event_type, "count": count} for event_type, count in top]
 
-    session = SessionLocal()
-    try:
         query = (
-            select(Event.event_type, func.count().label("cnt"))
-            .where(Event.occurred_at >= from_date)
-            .where(Event.occurred_at <= to_date)
-            .group_by(Event.event_type)
-            .order_by(func.count().desc())
+            select(DailyEventCount.event_type, func.sum(DailyEventCount.count).label("cnt"))
+            .where(DailyEventCount.day.between(from_dt, to_dt))
+            .group_by(DailyEventCount.event_type)
+            .order_by(func.sum(DailyEventCount.count).desc(), DailyEventCount.event_type)
             .limit(limit)
         )
-        results = session.execute(query).all()
-        logger.info(f'/top-events called with from={from_date}, to={to_date}, limit={limit}, results={len(results)}')
+        results = (await session.execute(query)).all()
         return [{"event_type": r.event_type, "count": r.cnt} for r in results]
-    finally:
-        session.close()
+
+    results = await analytics_cache.get_or_compute(
+        ("top-events", from_dt, to_dt, limit, _props_key(props)),
+        days_between(from_dt, to_dt),
+        _timed("top-events", compute),
+    )
+    logger.info("/top-events called with from=%s, to=%s, limit=%d, results=%d", from_date, to_date, limit, len(results))
+    return results
 
 
 @analytics_router.get("/retention")
-def get_retention(start_date: str = Query(...), windows: int = Query(7)):
+async def get_retention(
+    start_date: str = Query(...),
+    windows: int = Query(7),
+    props: dict = Depends(property_filters),
+    session: AsyncSession = Depends(get_db)
+):
     if windows <= 0:
         raise HTTPException(status_code=400, detail="Windows must be greater than 0")
+    start_dt = _parse_date(start_date, "start_date")
 
-    session = SessionLocal()
-    try:
-        start_dt = datetime.fromisoformat(start_date).date()
-
-        user_birthdays = select(
-            Event.user_id,
-            func.min(func.date(Event.occurred_at)).label("first_activity_date")
-        ).group_by(Event.user_id).subquery()
+    async def compute():
+        if props:
+            sizes, returning = await _filtered_cohorts(session, start_dt, start_dt, windows, props)
+            cohort_size = sizes.get(start_dt, 0)
+            retention = [
+                {"day": day, "returning_users": returning.get((start_dt, day), 0)} for day in range(1, windows + 1)
+            ] if cohort_size else []
+            return {"start_date": start_date, "cohort_size": cohort_size, "retention": retention}
 
-        cohort_query = select(user_birthdays.c.user_id).where(
-            user_birthdays.c.first_activity_date == start_dt
-        )
+        cached = hot_window.retention(start_dt, windows)
+        if cached is not None:
+            cohort_size, returning = cached
+            retention = [{"day": day, "returning_users": users} for day, users in enumerate(returning, start=1)]
+            return {"start_date": start_date, "cohort_size": cohort_size, "retention": retention}
 
-        cohort_users = [row[0] for row in session.execute(cohort_query)]
-        cohort_size = len(cohort_users)
+        cohort_size_query = select(func.count()).where(UserFirstSeen.first_seen == start_dt)
+        cohort_size = (await session.execute(cohort_size_query)).scalar()
 
         if cohort_size == 0:
-            logger.info(f"/retention: No users found for cohort {start_date}")
             return {"start_date": start_date, "cohort_size": 0, "retention": []}
 
-        retention = []
-        for day in range(1, windows + 1):
-            day_dt = start_dt + timedelta(days=day)
+        day_offset = (DailyUserActivity.day - start_dt).label("day")
+        returning_query = (
+            select(day_offset, func.count(func.distinct(DailyUserActivity.user_id)).label("returning_users"))
+            .join(UserFirstSeen, UserFirstSeen.user_id == DailyUserActivity.user_id)
+            .where(UserFirstSeen.first_seen == start_dt)
+            .where(DailyUserActivity.day.between(start_dt + timedelta(days=1), start_dt + timedelta(days=windows)))
+            .group_by(day_offset)
+        )
+
+        returning = {r.day: r.returning_users for r in await session.execute(returning_query)}
+        retention = [{"day": day, "returning_users": returning.get(day, 0)} for day in range(1, windows + 1)]
+        return {"start_date": start_date, "cohort_size": cohort_size, "retention": retention}
+
+    result = await analytics_cache.get_or_compute(
+        ("retention", start_date, windows, _props_key(props)),
+        days_between(start_dt, start_dt + timedelta(days=windows)),
+        _timed("retention", compute),
+    )
+    logger.info("/retention called with start_date=%s, windows=%d, cohort_size=%d", start_date, windows, result["cohort_size"])
+    return result
+
+
+@analytics_router.get("/retention-matrix")
+async def get_retention_matrix(
+    from_date: str = Query(...),
+    to_date: str = Query(...),
+    windows: int = Query(7),
+    props: dict = Depends(property_filters),
+    session: AsyncSession = Depends(get_db)
+):
+    if windows <= 0:
+        raise HTTPException(status_code=400, detail="Windows must be greater than 0")
+    from_dt, to_dt = _parse_range(from_date, to_date)
+
+    async def compute():
+        if props:
+            sizes, returning = await _filtered_cohorts(session, from_dt, to_dt, windows, props)
+            return {
+                "from_date": from_date,
+                "to_date": to_date,
+                "windows": windows,
+                "cohorts": [
+                    {
+                        "cohort": cohort.strftime("%Y-%m-%d"),
+                        "cohort_size": sizes[cohort],
+                        "retention": [returning.get((cohort, day), 0) for day in range(1, windows + 1)],
+                    }
+                    for cohort in sorted(sizes)
+                ],
+            }
+
+        cohort_sizes_query = (
+            select(UserFirstSeen.first_seen, func.count().label("size"))
+            .where(UserFirstSeen.first_seen.between(from_dt, to_dt))
+            .group_by(UserFirstSeen.first_seen)
+            .order_by(UserFirstSeen.first_seen)
+        )
+        cohort_sizes = (await session.execute(cohort_sizes_query)).all()
+
+        day_offset = (DailyUserActivity.day - UserFirstSeen.first_seen).label("day")
+        returning_query = (
+            select(UserFirstSeen.first_seen, day_offset, func.count(func.distinct(DailyUserActivity.user_id)).label("returning_users"))
+            .join(UserFirstSeen, UserFirstSeen.user_id == DailyUserActivity.user_id)
+            .where(UserFirstSeen.first_seen.between(from_dt, to_dt))
+            .where(DailyUserActivity.day.between(from_dt + timedelta(days=1), to_dt + timedelta(days=windows)))
+            .where(day_offset.between(1, windows))
+            .group_by(UserFirstSeen.first_seen, day_offset)
+        )
+
+        matrix = {r.first_seen: [0] * windows for r in cohort_sizes}
+        for r in await session.execute(returning_query):
+            matrix[r.first_seen][r.day - 1] = r.returning_users
+
+        return {
+            "from_date": from_date,
+            "to_date": to_date,
+            "windows": windows,
+            "cohorts": [
+                {"cohort": r.first_seen.strftime("%Y-%m-%d"), "cohort_size": r.size, "retention": matrix[r.first_seen]}
+                for r in cohort_sizes
+            ],
+        }
+
+    result = await analytics_cache.get_or_compute(
+        ("retention-matrix", from_date, to_date, windows, _props_key(props)),
+        days_between(from_dt, to_dt + timedelta(days=windows)),
+        _timed("retention-matrix", compute),
+    )
+    logger.info(
+        "/retention-matrix called with from=%s, to=%s, windows=%d, cohorts=%d",
+        from_date, to_date, windows, len(result["cohorts"]))
+    return result
+
+
+@analytics_router.get("/funnel")
+async def get_funnel(
+    steps: str = Query(..., description="Comma-separated event types, e.g. login,view_item,purchase"),
+    from_date: str = Query(..., description="Funnels must start in [from_date, to_date]"),
+    to_date: str = Query(...),
+    within: str = Query("1d", description="Conversion window from the first step: 30m, 12h, 7d"),
+    props: dict = Depends(property_filters),
+    session: AsyncSession = Depends(get_db)
+):
+    step_list = [step.strip() for step in steps.split(",")]
+    if len(step_list) < 2 or len(step_list) > FUNNEL_MAX_STEPS or not all(step_list):
+        raise HTTPException(status_code=400, detail=f"'steps' must list 2 to {FUNNEL_MAX_STEPS} event types")
+    from_dt, to_dt = _parse_range(from_date, to_date)
+    window = _parse_duration(within, "within", FUNNEL_MAX_WITHIN_DAYS)
+    start = datetime.combine(from_dt, datetime.min.time())
+    anchor_end = datetime.combine(to_dt + timedelta(days=1), datetime.min.time())
+
+    async def compute():
+        # Only the step events are read, in (user_id, occurred_at) order, and folded one user at a time.
+        query = (
+            select(Event.user_id, Event.occurred_at, Event.event_type)
+            .where(Event.event_type.in_(set(step_list)))
+            .where(Event.occurred_at >= start, Event.occurred_at < anchor_end + window)
+            .where(*[_property_clause(key, value) for key, value in sorted(props.items())])
+            .order_by(Event.user_id, Event.occurred_at)
+            .execution_options(yield_per=FUNNEL_FETCH_ROWS)
+        )
+        counter = FunnelCounter(step_list, window, anchor_end)
+        result = await session.stream(query)
+        async for rows in result.partitions():
+            for user_id, occurred_at, event_type in rows:
+                counter.add(user_id, occurred_at, event_type)
+
+        return {
+            "from_date": from_date,
+            "to_date": to_date,
+            "within_seconds": int(window.total_seconds()),
+            "steps": counter.result(),
+        }
+
+    result = await analytics_cache.get_or_compute(
+        ("funnel", from_dt, to_dt, tuple(step_list), window, _props_key(props)),
+        days_between(from_dt, (anchor_end + window).date()),
+        _timed("funnel", compute),
+    )
+    logger.info(
+        "/funnel called with steps=%s, from=%s, to=%s, within=%s, entered=%d",
+        steps, from_date, to_date, within, result["steps"][0]["users"])
+    return result
+
+
+@analytics_router.get("/top-values")
+async def get_top_values(
+    property: str = Query(..., description="Property key, e.g. item_id"),
+    from_date: str = Query(...),
+    to_date: str = Query(...),
+    limit: int = Query(10, description="Maximum number of values to return"),
+    exact: bool = Query(False, description="Count with SQL instead of the daily Space-Saving summaries"),
+    props: dict = Depends(property_filters),
+    session: AsyncSession = Depends(get_db)
+):
+    if limit <= 0:
+        raise HTTPException(status_code=400, detail="Limit must be greater than 0")
+    if props and not exact:
+        raise HTTPException(status_code=400, detail="Property filters need exact=true")
+    if not exact and property not in TOP_VALUES_PROPERTIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"No summaries for '{property}' (kept for {TOP_VALUES_PROPERTIES}); use exact=true",
+        )
+    from_dt, to_dt = _parse_range(from_date, to_date)
 
-            returning_count_query = (
-                select(func.count(func.distinct(Event.user_id)))
-                .where(
-                    Event.user_id.in_(cohort_users),
-                    func.date(Event.occurred_at) == day_dt
-                )
+    async def compute():
+        if exact:
+            value = PROMOTED_PROPERTIES.get(property, Event.properties[property].astext)
+            count = func.count().label("cnt")
+            query = (
+                select(value.label("value"), count, func.sum(count).over().label("total"))
+                .where(*_event_filters(from_dt, to_dt, props), value.isnot(None))
+                .group_by(value)
+                .order_by(count.desc(), value)
+                .limit(limit)
             )
+            rows = (await session.execute(query)).all()
+            values = [{"value": r.value, "count": r.cnt, "error": 0} for r in rows]
+            return {"total": int(rows[0].total) if rows else 0, "max_error": 0, "values": values}
+
+        merged = SpaceSaving()
+        query = (
+            select(DailyPropertySketch.counters)
+            .where(DailyPropertySketch.property == property)
+            .where(DailyPropertySketch.day.between(from_dt, to_dt))
+        )
+        for counters in (await session.execute(query)).scalars():
+            merged.merge(SpaceSaving.from_bytes(counters))
+        values = [{"value": value, "count": count, "error": error} for value, count, error in merged.top(limit)]
+        return {"total": merged.total, "max_error": merged.max_error(), "values": values}
 
-            returning_count = session.execute(returning_count_query).scalar()
-            retention.append({"day": day, "returning_users": returning_count})
+    result = await analytics_cache.get_or_compute(
+        ("top-values", property, from_dt, to_dt, limit, exact, _props_key(props)),
+        days_between(from_dt, to_dt),
+        _timed("top-values", compute),
+    )
+    logger.info(
+        "/top-values called with property=%s, from=%s, to=%s, exact=%s, results=%d",
+        property, from_date, to_date, exact, len(result["values"]))
+    return {"property": property, "from_date": from_date, "to_date": to_date, "exact": exact, **result}
+
+
+class StatsQuery(BaseModel):
+    query: str = Field(..., description="Endpoint name: dau, active-users, top-events, top-values, ...")
+    params: dict = Field(default_factory=dict, description="Its query parameters, including prop.<key>")
 
-        logger.info(f"/retention called with start_date={start_date}, windows={windows}, cohort_size={cohort_size}")
-        return {"start_date": start_date, "cohort_size": cohort_size, "retention": retention}
 
+BATCH_QUERIES = {
+    "dau": get_dau,
+    "active-users": get_active_users,
+    "top-events": get_top_events,
+    "retention": get_retention,
+    "retention-matrix": get_retention_matrix,
+    "funnel": get_funnel,
+    "top-values": get_top_values,
+}
+# Answered from the events table when filtered by more than country, so they can share a slice scan.
+SLICE_QUERIES = {"dau", "active-users", "top-events"}
+
+
+def _bind_query(item):
+    """Handler and keyword arguments for one batch item, validated like query parameters."""
+    handler = BATCH_QUERIES.get(item.query)
+    if handler is None:
+        raise HTTPException(status_code=400, detail=f"Unknown query '{item.query}', expected {list(BATCH_QUERIES)}")
+
+    params = {name: value for name, value in item.params.items() if not name.startswith("prop.")}
+    props = {name[len("prop."):]: str(value) for name, value in item.params.items() if name.startswith("prop.")}
+    kwargs = {"props": props}
+    for name, parameter in inspect.signature(handler).parameters.items():
+        if name in ("props", "session"):
+            continue
+        if name not in params:
+            if parameter.default.is_required():
+                raise HTTPException(status_code=400, detail=f"'{name}' is required")
+            kwargs[name] = parameter.default.default
+            continue
+        try:
+            kwargs[name] = TypeAdapter(parameter.annotation).validate_python(params.pop(name))
+        except ValidationError:
+            raise HTTPException(status_code=400, detail=f"'{name}' must be of type {parameter.annotation.__name__}")
+    if params:
+        raise HTTPException(status_code=400, detail=f"Unknown parameters: {sorted(params)}")
+    return handler, kwargs
+
+
+def _slice_of(query, kwargs):
+    if query not in SLICE_QUERIES or kwargs.get("approx"):
+        return None
+    props = _with_country(kwargs["props"], kwargs.get("country"))
+    reads_events = bool(props) if query == "top-events" else not _country_only(props)
+    if not reads_events:
+        return None
+    try:
+        return _slice_key(*_parse_range(kwargs["from_date"], kwargs["to_date"]), props)
+    except HTTPException:
+        return None
+
+
+@analytics_router.post("/batch")
+async def get_batch(
+    queries: list[StatsQuery] = Body(..., description="Dashboard queries run on one connection"),
+    session: AsyncSession = Depends(get_db)
+):
+    if not queries or len(queries) > STATS_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Send 1 to {STATS_BATCH_MAX_QUERIES} queries")
+
+    bound = []
+    for item in queries:
+        try:
+            bound.append(_bind_query(item))
+        except HTTPException as e:
+            bound.append(e)
+
+    slices = Counter(_slice_of(item.query, call[1]) for item, call in zip(queries, bound) if isinstance(call, tuple))
+    shared = {key: None for key, uses in slices.items() if key is not None and uses > 1}
+    token = _shared_slices.set(shared)
+    results = []
+    try:
+        for item, call in zip(queries, bound):
+            try:
+                if isinstance(call, HTTPException):
+                    raise call
+                handler, kwargs = call
+                result = await handler(**kwargs, session=session)
+                results.append({"query": item.query, "status": 200, "result": result})
+            except HTTPException as e:
+                results.append({"query": item.query, "status": e.status_code, "detail": e.detail})
     finally:
-        session.close()
+        _shared_slices.reset(token)
+
+    logger.info(
+        "/batch called with queries=%d, shared_scans=%d",
+        len(queries), len(shared))
+    return results
+
+
+@analytics_router.get("/cache")
+async def get_cache_stats():
+    return analytics_cache.info()
+
 
+@analytics_router.get("/hot-window")
+async def get_hot_window_stats():
+    return hot_window.info()
@@ -1,44 +1,194 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import EventSchema
+from app.batcher import event_batcher
+from app.database import get_db, get_session_factory
+from app.dedup import deduplicator
+from app.export import export_events
+from app.fast_ingest import decode_events, decode_line, iter_ndjson
+from app.ingest import utc_naive
+from app.logging_setup import get_logger
+from app.metrics import EVENTS_DUPLICATE_DROPPED, EVENTS_QUEUED, EVENTS_RECEIVED, EVENTS_REJECTED
 from app.tasks import insert_events_task
 from collections import Counter
-import logging
-import json
+from datetime import date
+import asyncio
+import os
 import time
+import zlib
+
+FAST_INGEST = os.getenv("INGEST_FAST_DECODE", "false").lower() in ("1", "true", "yes")
+STREAM_CHUNK_EVENTS = int(os.getenv("INGEST_STREAM_CHUNK_EVENTS", "5000"))
+MAX_REPORTED_ERRORS = 100
 
 events_router = APIRouter()
 event_counter = Counter()
 
-logger = logging.getLogger("events_api")
-logger.setLevel(logging.INFO)
+logger = get_logger("events_api", "logs/events_api.log")
+
+
+def count_rejected(errors):
+    return len({tuple(e["loc"][:2]) for e in errors})
+
+
+async def _queue_events(session, events):
+    event_counter["total_events_received"] += len(events)
+    EVENTS_RECEIVED.labels(endpoint="batch").inc(len(events))
+    start_time = time.time()
+
+    events, duplicates = await deduplicator.drop_duplicates(session, events)
+    EVENTS_DUPLICATE_DROPPED.labels(endpoint="batch").inc(duplicates)
+    task_id, segment = await event_batcher.submit(events) if events else (None, None)
+    EVENTS_QUEUED.labels(endpoint="batch").inc(len(events))
 
-formatter = logging.Formatter(json.dumps({
-    "time": "%(asctime)s",
-    "level": "%(levelname)s",
-    "message": "%(message)s"
-}))
+    processing_time = time.time() - start_time
+    logger.info(
+        "Received %d events, duplicates=%d, total=%d, processing_time=%.3fs",
+        len(events) + duplicates, duplicates, event_counter["total_events_received"], processing_time)
 
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
+    return {
+        "status": "queued",
+        "task_id": task_id,
+        "segment": dict(zip(("offset", "length"), segment)) if segment else None,
+        "queued_events": len(events),
+        "duplicates_dropped": duplicates,
+    }
 
-file_handler = logging.FileHandler("logs/events_api.log")
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
 
+def event_payload(event):
+    # Same form as the fast decoder, so both paths queue identical events.
+    return {**event.dict(), "event_id": str(event.event_id), "occurred_at": utc_naive(event.occurred_at).isoformat()}
 
-@events_router.post("/")
-async def ingest_events(events: list[EventSchema], dry_run: bool = False):
+
+async def ingest_events(events: list[EventSchema], dry_run: bool = False, session: AsyncSession = Depends(get_db)):
     if dry_run:
         return {"status": "dry_run", "queued_events": len(events)}
 
-    event_counter["total_events_received"] += len(events)
+    return await _queue_events(session, [event_payload(e) for e in events])
+
+
+async def ingest_events_fast(request: Request, dry_run: bool = False, session: AsyncSession = Depends(get_db)):
+    events, errors = decode_events(await request.body())
+    if errors:
+        rejected = count_rejected(errors)
+        EVENTS_RECEIVED.labels(endpoint="batch").inc(rejected)
+        EVENTS_REJECTED.labels(endpoint="batch").inc(rejected)
+        return JSONResponse(status_code=422, content={"detail": errors})
+
+    if dry_run:
+        return {"status": "dry_run", "queued_events": len(events)}
+
+    return await _queue_events(session, events)
+
+
+if FAST_INGEST:
+    events_router.add_api_route("/", ingest_events_fast, methods=["POST"], openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": {"type": "array", "items": EventSchema.schema()}}},
+        }
+    })
+else:
+    events_router.add_api_route("/", ingest_events, methods=["POST"])
+
+
+@events_router.post("/stream")
+async def ingest_events_stream(request: Request, session: AsyncSession = Depends(get_db)):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type != "application/x-ndjson":
+        raise HTTPException(status_code=415, detail="Content-Type must be application/x-ndjson")
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
     start_time = time.time()
 
-    task = insert_events_task.delay([e.dict() for e in events])
+    accepted = 0
+    rejected = 0
+    duplicates = 0
+    errors = []
+    task_ids = []
+    chunk = []
+
+    async def dispatch(events):
+        nonlocal duplicates
+        events, dropped = await deduplicator.drop_duplicates(session, events)
+        duplicates += dropped
+        EVENTS_DUPLICATE_DROPPED.labels(endpoint="stream").inc(dropped)
+        if not events:
+            return
+        task = await asyncio.to_thread(insert_events_task.delay, events)
+        task_ids.append(task.id)
+        event_counter["total_events_received"] += len(events)
+        EVENTS_QUEUED.labels(endpoint="stream").inc(len(events))
+
+    try:
+        async for line_no, line in iter_ndjson(request.stream(), gzipped):
+            line_errors = []
+            event = decode_line(line, line_no, line_errors)
+            EVENTS_RECEIVED.labels(endpoint="stream").inc()
+            if event is None:
+                rejected += 1
+                EVENTS_REJECTED.labels(endpoint="stream").inc()
+                errors.extend(line_errors[:MAX_REPORTED_ERRORS - len(errors)])
+                continue
+
+            accepted += 1
+            chunk.append(event)
+            if len(chunk) >= STREAM_CHUNK_EVENTS:
+                await dispatch(chunk)
+                chunk = []
+
+        if chunk:
+            await dispatch(chunk)
+    except (ValueError, zlib.error) as e:
+        # Lines read before the broken part are valid and counted as accepted, so they are queued too.
+        if chunk:
+            await dispatch(chunk)
+        logger.info("Stream ingest aborted after %d events: %s", accepted, e)
+        return JSONResponse(status_code=400, content={
+            "detail": str(e), "accepted": accepted, "rejected": rejected,
+            "queued_events": accepted - duplicates, "duplicates_dropped": duplicates, "task_ids": task_ids,
+        })
 
     processing_time = time.time() - start_time
     logger.info(
-        f"Received {len(events)} events, total={event_counter['total_events_received']}, processing_time={processing_time:.3f}s")
+        "Streamed %d events, rejected=%d, duplicates=%d, tasks=%d, processing_time=%.3fs",
+        accepted, rejected, duplicates, len(task_ids), processing_time)
+
+    return {
+        "status": "queued",
+        "accepted": accepted,
+        "rejected": rejected,
+        "queued_events": accepted - duplicates,
+        "duplicates_dropped": duplicates,
+        "task_ids": task_ids,
+        "errors": errors,
+    }
+
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+@events_router.get("/export")
+async def export_events_range(
+    from_date: str = Query(..., description="Start date in YYYY-MM-DD format"),
+    to_date: str = Query(..., description="End date in YYYY-MM-DD format, inclusive"),
+    event_type: str = Query(None),
+    format: str = Query("ndjson", description="ndjson or csv (the events_sample.csv layout)"),
+    gzip: bool = Query(False, description="Return a .gz file"),
+    session_factory=Depends(get_session_factory),
+):
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="'format' must be ndjson or csv")
+    try:
+        from_dt, to_dt = date.fromisoformat(from_date), date.fromisoformat(to_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    if from_dt > to_dt:
+        raise HTTPException(status_code=400, detail="'from_date' must be before 'to_date'")
 
-    return {"status": "queued", "task_id": task.id, "queued_events": len(events)}
+    filename = f"events_{from_dt}_{to_dt}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_events(session_factory, from_dt, to_dt, event_type, format, gzip),
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
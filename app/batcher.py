@@ -0,0 +1,74 @@
+import asyncio
+import os
+import time
+
+from app.metrics import INGEST_DISPATCH_SECONDS, INGEST_FLUSH_EVENTS
+from app.tasks import insert_events_task
+
+MAX_BATCH_EVENTS = int(os.getenv("INGEST_BATCH_MAX_EVENTS", "5000"))
+MAX_BATCH_DELAY_MS = int(os.getenv("INGEST_BATCH_MAX_DELAY_MS", "50"))
+
+
+class EventBatcher:
+
+    def __init__(self, max_events=MAX_BATCH_EVENTS, max_delay_ms=MAX_BATCH_DELAY_MS):
+        self.max_events = max_events
+        self.max_delay = max_delay_ms / 1000
+        self._pending = []
+        self._segments = []
+        self._waiters = []
+        self._timer = None
+        self._inflight = set()
+
+    async def submit(self, events):
+        """Returns (task_id, (offset, length)); the task result lists the outcome of each segment by offset."""
+        waiter = asyncio.get_running_loop().create_future()
+        segment = (len(self._pending), len(events))
+        self._pending.extend(events)
+        self._segments.append(segment)
+        self._waiters.append(waiter)
+
+        if len(self._pending) >= self.max_events:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+
+        return await waiter, segment
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        events, segments, waiters = self._pending, self._segments, self._waiters
+        self._pending, self._segments, self._waiters = [], [], []
+        if not events:
+            return
+
+        dispatch = asyncio.get_running_loop().create_task(self._dispatch(events, segments, waiters))
+        self._inflight.add(dispatch)
+        dispatch.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, events, segments, waiters):
+        INGEST_FLUSH_EVENTS.observe(len(events))
+        dispatch_start = time.perf_counter()
+        try:
+            task = await asyncio.to_thread(insert_events_task.delay, events, [list(s) for s in segments])
+            INGEST_DISPATCH_SECONDS.observe(time.perf_counter() - dispatch_start)
+        except Exception as e:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(task.id)
+
+    async def close(self):
+        self.flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+
+event_batcher = EventBatcher()
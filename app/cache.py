@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+import redis
+
+from app.logging_setup import get_logger
+from app.redis_client import get_async_redis, get_redis
+
+CACHE_ENABLED = os.getenv("ANALYTICS_CACHE", "true").lower() in ("1", "true", "yes")
+CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "1024"))
+CACHE_REDIS_TIER = os.getenv("ANALYTICS_CACHE_REDIS", "false").lower() in ("1", "true", "yes")
+CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "86400"))
+
+DAY_VERSION_PREFIX = "analytics:day:"
+EPOCH_KEY = "analytics:epoch"
+RESULT_PREFIX = "analytics:result:"
+
+logger = get_logger("analytics_cache")
+
+
+def days_between(from_dt, to_dt):
+    return [from_dt + timedelta(days=i) for i in range((to_dt - from_dt).days + 1)]
+
+
+def _bump(keys):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(key)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Failed to invalidate analytics cache (%d keys): %s", len(keys), e)
+
+
+def invalidate_days(days):
+    if CACHE_ENABLED and days:
+        _bump([f"{DAY_VERSION_PREFIX}{day}" for day in sorted(days)])
+
+
+def invalidate_all():
+    if CACHE_ENABLED:
+        _bump([EPOCH_KEY])
+
+
+class AnalyticsCache:
+
+    def __init__(self, max_entries=CACHE_SIZE, redis_tier=CACHE_REDIS_TIER):
+        self.max_entries = max_entries
+        self.redis_tier = redis_tier
+        self.stats = Counter()
+        self._entries = OrderedDict()
+        self._inflight = {}
+
+    async def _versions(self, days):
+        versions = await get_async_redis().mget([EPOCH_KEY] + [f"{DAY_VERSION_PREFIX}{day}" for day in days])
+        return hashlib.sha1(repr(versions).encode()).hexdigest()
+
+    def _remember(self, key, token, value):
+        self._entries[key] = (token, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(self, query_key, days, compute):
+        if not CACHE_ENABLED:
+            return await compute()
+
+        key = repr(query_key)
+        try:
+            token = await self._versions(days)
+        except redis.RedisError as e:
+            logger.warning("Analytics cache bypassed: %s", e)
+            self.stats["errors"] += 1
+            return await compute()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == token:
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+        result_key = f"{RESULT_PREFIX}{hashlib.sha1(key.encode()).hexdigest()}:{token}"
+        if self.redis_tier:
+            try:
+                cached = await get_async_redis().get(result_key)
+            except redis.RedisError:
+                cached = None
+            if cached is not None:
+                value = json.loads(cached)
+                self._remember(key, token, value)
+                self.stats["redis_hits"] += 1
+                return value
+
+        flight_key = (key, token)
+        if flight_key in self._inflight:
+            self.stats["coalesced"] += 1
+            flight = self._inflight[flight_key]
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+            # The leader was cancelled (e.g. its client disconnected): start over, one follower becomes the leader.
+            return await self.get_or_compute(query_key, days, compute)
+
+        self.stats["misses"] += 1
+        flight = asyncio.get_running_loop().create_future()
+        self._inflight[flight_key] = flight
+        try:
+            value = await compute()
+            flight.set_result(value)
+        except Exception as e:
+            flight.set_exception(e)
+            flight.exception()
+            raise
+        finally:
+            del self._inflight[flight_key]
+            if not flight.done():
+                flight.cancel()
+
+        self._remember(key, token, value)
+        if self.redis_tier:
+            try:
+                await get_async_redis().set(result_key, json.dumps(value), ex=CACHE_TTL)
+            except redis.RedisError as e:
+                logger.warning("Failed to store analytics result in redis: %s", e)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def info(self):
+        return {"enabled": CACHE_ENABLED, "entries": len(self._entries), **self.stats}
+
+
+analytics_cache = AnalyticsCache()
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import time
+import uuid
+
+import redis
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.logging_setup import get_logger
+from app.metrics import DEDUP_UNCONFIRMED
+from app.models import EventId
+from app.redis_client import get_async_redis
+
+DEDUP_ENABLED = os.getenv("INGEST_DEDUP", "true").lower() in ("1", "true", "yes")
+DEDUP_BITS = int(os.getenv("INGEST_DEDUP_BITS", str(2 ** 27)))
+DEDUP_HASHES = int(os.getenv("INGEST_DEDUP_HASHES", "7"))
+DEDUP_BUCKET_SECONDS = int(os.getenv("INGEST_DEDUP_BUCKET_SECONDS", "3600"))
+
+logger = get_logger("ingest_dedup")
+
+# Bloom filter check-and-add over the current and previous time bucket.
+# ARGV[3..] holds ARGV[2] bit positions per event; returns 1 for events that may have been seen.
+BLOOM_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+local hashes = tonumber(ARGV[2])
+local seen = {}
+for i = 3, #ARGV, hashes do
+    local in_current, in_previous = 1, 1
+    for j = i, i + hashes - 1 do
+        if in_current == 1 and redis.call('GETBIT', KEYS[1], ARGV[j]) == 0 then in_current = 0 end
+        if in_previous == 1 and redis.call('GETBIT', KEYS[2], ARGV[j]) == 0 then in_previous = 0 end
+        redis.call('SETBIT', KEYS[1], ARGV[j], 1)
+    end
+    seen[#seen + 1] = math.max(in_current, in_previous)
+end
+redis.call('EXPIRE', KEYS[1], ttl)
+return seen
+"""
+
+
+class EventDeduplicator:
+
+    def __init__(self, bits=DEDUP_BITS, hashes=DEDUP_HASHES, bucket_seconds=DEDUP_BUCKET_SECONDS):
+        self.bits = bits
+        self.hashes = hashes
+        self.bucket_seconds = bucket_seconds
+        self._script = None
+
+    def _bloom_script(self):
+        client = get_async_redis()
+        if self._script is None or self._script.registered_client is not client:
+            self._script = client.register_script(BLOOM_SCRIPT)
+        return self._script
+
+    def _positions(self, event_id):
+        digest = hashlib.blake2b(event_id.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    async def maybe_seen(self, event_ids):
+        bucket = int(time.time() // self.bucket_seconds)
+        positions = [position for event_id in event_ids for position in self._positions(event_id)]
+        flags = await self._bloom_script()(
+            keys=[f"dedup:{bucket}", f"dedup:{bucket - 1}"],
+            args=[2 * self.bucket_seconds, self.hashes, *positions],
+        )
+        return [bool(flag) for flag in flags]
+
+    async def drop_duplicates(self, session, events):
+        """Returns (events to queue, number dropped). Only ids already in event_ids are dropped."""
+        unique = {}
+        for event in events:
+            unique.setdefault(str(event["event_id"]), event)
+        if not DEDUP_ENABLED or not unique:
+            return list(unique.values()), len(events) - len(unique)
+
+        try:
+            flags = await self.maybe_seen(list(unique))
+        except redis.RedisError as e:
+            logger.warning("Dedup filter unavailable, queueing all events: %s", e)
+            return list(unique.values()), len(events) - len(unique)
+
+        suspects = [uuid.UUID(event_id) for event_id, seen in zip(unique, flags) if seen]
+        if suspects:
+            try:
+                stored = await session.execute(select(EventId.event_id).where(EventId.event_id.in_(suspects)))
+            except SQLAlchemyError as e:
+                logger.warning("Could not confirm %d possible duplicates, queueing them: %s", len(suspects), e)
+                return list(unique.values()), len(events) - len(unique)
+            confirmed = {str(event_id) for event_id in stored.scalars()}
+            DEDUP_UNCONFIRMED.inc(len(suspects) - len(confirmed))
+            for event_id in confirmed:
+                del unique[event_id]
+        return list(unique.values()), len(events) - len(unique)
+
+
+deduplicator = EventDeduplicator()
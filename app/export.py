@@ -0,0 +1,131 @@
+import asyncio
+import csv
+import io
+import os
+import zlib
+from datetime import datetime, timedelta
+
+import orjson
+from sqlalchemy import select, tuple_
+
+from app.logging_setup import get_logger
+from app.metrics import EVENTS_EXPORTED
+from app.models import Event
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+# How long a chunk may wait for a slow client before the cursor and its pool connection are released.
+EXPORT_CLIENT_WAIT_SECONDS = float(os.getenv("EXPORT_CLIENT_WAIT_SECONDS", "5"))
+CSV_HEADER = ["event_id", "occurred_at", "user_id", "event_type", "properties_json"]
+
+logger = get_logger("events_export", "logs/events_api.log")
+
+
+def _export_query(from_dt, to_dt, event_type, after):
+    start = datetime.combine(from_dt, datetime.min.time())
+    end = datetime.combine(to_dt + timedelta(days=1), datetime.min.time())
+    query = (
+        select(Event.event_id, Event.occurred_at, Event.user_id, Event.event_type, Event.properties)
+        .where(Event.occurred_at >= start, Event.occurred_at < end)
+        .order_by(Event.occurred_at, Event.event_id)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    if event_type:
+        query = query.where(Event.event_type == event_type)
+    if after is not None:
+        query = query.where(tuple_(Event.occurred_at, Event.event_id) > after)
+    return query
+
+
+async def _produce(queue, session_factory, from_dt, to_dt, event_type):
+    # Rows are read with a server-side cursor in (occurred_at, event_id) order. If the client does not take a
+    # chunk in time, the cursor is closed and reopened later after the last row handed over.
+    after = None
+    try:
+        while True:
+            pending = None
+            async with session_factory() as session:
+                result = await session.stream(_export_query(from_dt, to_dt, event_type, after))
+                async for rows in result.partitions():
+                    after = (rows[-1].occurred_at, rows[-1].event_id)
+                    try:
+                        await asyncio.wait_for(queue.put(rows), EXPORT_CLIENT_WAIT_SECONDS)
+                    except asyncio.TimeoutError:
+                        pending = rows
+                        break
+                await result.close()
+            if pending is None:
+                await queue.put(None)
+                return
+            await queue.put(pending)
+    except Exception as e:
+        await queue.put(e)
+
+
+async def export_chunks(session_factory, from_dt, to_dt, event_type=None):
+    """Yields lists of event rows; at most a few chunks are in memory at any time."""
+    queue = asyncio.Queue(maxsize=1)
+    producer = asyncio.create_task(_produce(queue, session_factory, from_dt, to_dt, event_type))
+    try:
+        while True:
+            rows = await queue.get()
+            if rows is None:
+                return
+            if isinstance(rows, Exception):
+                raise rows
+            yield rows
+    finally:
+        producer.cancel()
+
+
+def encode_ndjson(rows):
+    return b"".join(
+        orjson.dumps({
+            "event_id": row.event_id,
+            "occurred_at": row.occurred_at,
+            "user_id": row.user_id,
+            "event_type": row.event_type,
+            "properties": row.properties,
+        }, option=orjson.OPT_APPEND_NEWLINE)
+        for row in rows
+    )
+
+
+def encode_csv(rows, header=False):
+    # Same layout as data/events_sample.csv, so exports load back with import_events.py.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_HEADER)
+    for row in rows:
+        writer.writerow([
+            row.event_id,
+            row.occurred_at.isoformat(),
+            row.user_id,
+            row.event_type,
+            orjson.dumps(row.properties).decode() if row.properties is not None else "",
+        ])
+    return buffer.getvalue().encode()
+
+
+async def export_events(session_factory, from_dt, to_dt, event_type, export_format, gzipped):
+    compressor = zlib.compressobj(wbits=31) if gzipped else None
+    exported = 0
+    if export_format == "csv":
+        header = encode_csv([], header=True)
+        yield compressor.compress(header) if compressor else header
+
+    try:
+        async for rows in export_chunks(session_factory, from_dt, to_dt, event_type):
+            data = encode_csv(rows) if export_format == "csv" else encode_ndjson(rows)
+            exported += len(rows)
+            EVENTS_EXPORTED.labels(format=export_format).inc(len(rows))
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+        if compressor:
+            yield compressor.flush()
+    except Exception:
+        logger.exception("Export %s..%s failed after %d events", from_dt, to_dt, exported)
+        raise
+    logger.info("Exported %d events for %s..%s, format=%s, gzip=%s", exported, from_dt, to_dt, export_format, gzipped)
@@ -0,0 +1,134 @@
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+import orjson
+from pydantic import TypeAdapter, ValidationError
+
+MAX_LINE_BYTES = 1024 * 1024
+# EventSchema's own datetime rules: ISO strings with or without offset, dates, unix seconds/milliseconds.
+_DATETIME = TypeAdapter(datetime)
+
+
+def _error(index, field, msg, error_type):
+    return {"loc": ["body", index, field], "msg": msg, "type": error_type}
+
+
+def _required_str(event, index, field, errors):
+    value = event.get(field)
+    if value is None:
+        errors.append(_error(index, field, "Field required", "missing"))
+    elif not isinstance(value, str):
+        errors.append(_error(index, field, "Input should be a valid string", "string_type"))
+    elif not value:
+        errors.append(_error(index, field, "String should have at least 1 character", "string_too_short"))
+    else:
+        return value
+
+
+def validate_event(event, index, errors):
+    if not isinstance(event, dict):
+        errors.append({"loc": ["body", index], "msg": "Input should be a valid dictionary", "type": "dict_type"})
+        return None
+
+    error_count = len(errors)
+
+    event_id = event.get("event_id")
+    try:
+        parsed_id = uuid.UUID(event_id)
+        if parsed_id.version != 4:
+            errors.append(_error(index, "event_id", "UUID version 4 expected", "uuid_version"))
+    except (TypeError, ValueError, AttributeError):
+        errors.append(_error(index, "event_id", "Input should be a valid UUID", "uuid_parsing"))
+
+    occurred_at = None
+    try:
+        parsed = _DATETIME.validate_python(event.get("occurred_at"))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        occurred_at = parsed.isoformat()
+    except ValidationError as e:
+        error = e.errors()[0]
+        errors.append(_error(index, "occurred_at", error["msg"], error["type"]))
+
+    user_id = _required_str(event, index, "user_id", errors)
+    event_type = _required_str(event, index, "event_type", errors)
+
+    properties = event.get("properties", {})
+    if properties is not None and not isinstance(properties, dict):
+        errors.append(_error(index, "properties", "Input should be a valid dictionary", "dict_type"))
+
+    if len(errors) > error_count:
+        return None
+
+    return {
+        "event_id": str(parsed_id),
+        "occurred_at": occurred_at,
+        "user_id": user_id,
+        "event_type": event_type,
+        "properties": properties,
+    }
+
+
+def decode_events(body):
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        return None, [{"loc": ["body"], "msg": f"JSON decode error: {e}", "type": "json_invalid"}]
+
+    if not isinstance(payload, list):
+        return None, [{"loc": ["body"], "msg": "Input should be a valid list", "type": "list_type"}]
+
+    errors = []
+    events = [validate_event(event, index, errors) for index, event in enumerate(payload)]
+    if errors:
+        return None, errors
+    return events, []
+
+
+class _GzipInflater:
+    """Inflates a gzip body that may hold several members, e.g. files joined with `cat a.gz b.gz`."""
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def inflate(self, chunk):
+        while chunk:
+            if self._decompressor.eof:
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            yield self._decompressor.decompress(chunk, MAX_LINE_BYTES)
+            chunk = self._decompressor.unused_data or self._decompressor.unconsumed_tail
+
+    def flush(self):
+        return self._decompressor.flush()
+
+
+async def iter_ndjson(chunks, gzipped=False):
+    inflater = _GzipInflater() if gzipped else None
+    buffer = b""
+    line_no = 0
+
+    async for chunk in chunks:
+        for piece in inflater.inflate(chunk) if inflater else [chunk]:
+            lines = (buffer + piece).split(b"\n")
+            buffer = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield line_no, line
+                line_no += 1
+            if len(buffer) > MAX_LINE_BYTES:
+                raise ValueError(f"Line {line_no} exceeds {MAX_LINE_BYTES} bytes")
+
+    if inflater is not None:
+        buffer += inflater.flush()
+    if buffer.strip():
+        yield line_no, buffer
+
+
+def decode_line(line, line_no, errors):
+    try:
+        event = orjson.loads(line)
+    except orjson.JSONDecodeError as e:
+        errors.append({"loc": ["body", line_no], "msg": f"JSON decode error: {e}", "type": "json_invalid"})
+        return None
+    return validate_event(event, line_no, errors)
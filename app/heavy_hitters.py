@@ -0,0 +1,68 @@
+"""Space-Saving summaries for approximate top property values.
+
+A summary keeps at most `capacity` values, each with a count and an error.
+The true count of a kept value lies in [count - error, count]. A value that
+is not kept occurred at most `max_error()` times, which is 0 while fewer
+than `capacity` distinct values were seen. Summaries merge by adding
+counts, a value missing from one side being charged that side's max_error
+(Agarwal et al., "Mergeable Summaries"), so a range answer is built from
+daily summaries and keeps the same kind of bound.
+"""
+import os
+import zlib
+
+import orjson
+
+CAPACITY = int(os.getenv("TOP_VALUES_CAPACITY", "1000"))
+# Properties whose daily summaries are kept at insert time; the worker and the API need the same list.
+TOP_VALUES_PROPERTIES = [
+    key.strip() for key in os.getenv("TOP_VALUES_PROPERTIES", "country,item_id,method").split(",") if key.strip()
+]
+
+
+class SpaceSaving:
+
+    def __init__(self, capacity=CAPACITY, counters=None, total=0):
+        self.capacity = capacity
+        self.counters = counters if counters is not None else {}
+        self.total = total
+
+    @classmethod
+    def from_counts(cls, counts, capacity=CAPACITY):
+        """Summary of exact counts: the largest `capacity` values are kept with error 0."""
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return cls(capacity, {value: (count, 0) for value, count in ranked[:capacity]}, sum(counts.values()))
+
+    def max_error(self):
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def merge(self, other):
+        floor, other_floor = self.max_error(), other.max_error()
+        merged = {}
+        for value in self.counters.keys() | other.counters.keys():
+            count, error = self.counters.get(value, (floor, floor))
+            other_count, other_error = other.counters.get(value, (other_floor, other_floor))
+            merged[value] = (count + other_count, error + other_error)
+        kept = sorted(merged.items(), key=lambda item: (-item[1][0], item[0]))[:self.capacity]
+        self.counters = dict(kept)
+        self.total += other.total
+        return self
+
+    def top(self, limit):
+        ranked = sorted(self.counters.items(), key=lambda item: (-item[1][0], item[0]))
+        return [(value, count, error) for value, (count, error) in ranked[:limit]]
+
+    def to_bytes(self):
+        return zlib.compress(orjson.dumps({
+            "capacity": self.capacity,
+            "total": self.total,
+            "counters": [[value, count, error] for value, (count, error) in self.counters.items()],
+        }))
+
+    @classmethod
+    def from_bytes(cls, data):
+        state = orjson.loads(zlib.decompress(data))
+        counters = {value: (count, error) for value, count, error in state["counters"]}
+        return cls(state["capacity"], counters, state["total"])
@@ -0,0 +1,52 @@
+"""HyperLogLog sketches for approximate distinct-user counts.
+
+With PRECISION = 12 a sketch has 4096 one-byte registers and a relative
+standard error of 1.04 / sqrt(4096) ~= 1.6%; about 95% of estimates fall
+within +-3.3% of the exact count, 99.7% within +-4.9%. Small cardinalities
+(below ~10k) are answered by linear counting and are close to exact.
+Sketches merge losslessly by taking the register-wise maximum, so a range
+estimate built from daily sketches carries the same error bound.
+"""
+import hashlib
+import math
+import zlib
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+RELATIVE_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+_HASH_BITS = 64
+_RANK_BITS = _HASH_BITS - PRECISION
+_RANK_MASK = (1 << _RANK_BITS) - 1
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+
+class HyperLogLog:
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers) if registers is not None else bytearray(REGISTERS)
+
+    def add(self, value):
+        x = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        index = x >> _RANK_BITS
+        rank = _RANK_BITS - (x & _RANK_MASK).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        estimate = _ALPHA * REGISTERS * REGISTERS / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * REGISTERS and zeros:
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        return zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(zlib.decompress(data))
@@ -0,0 +1,421 @@
+"""In-memory columnar copy of the last HOT_WINDOW_DAYS days of events.
+
+The window loads each day from Postgres inside a REPEATABLE READ transaction and
+remembers that snapshot. After that it applies the rows the ingest path
+publishes to a Redis stream once their transaction has committed. Each stream
+message carries the transaction id (xid) of its insert. A message is skipped for
+a day when that xid is already visible in the day's load snapshot, so every row
+is counted exactly once. A periodic check compares per-day row counts with
+daily_event_counts and reloads any day that has drifted, for example after a
+lost message.
+"""
+import asyncio
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+
+import orjson
+import redis
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.cache import days_between
+from app.logging_setup import get_logger
+from app.redis_client import REDIS_SOCKET_TIMEOUT, get_async_redis, get_redis
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HOT_WINDOW_DAYS = int(os.getenv("HOT_WINDOW_DAYS", "0"))
+HOT_WINDOW_STREAM = "hotwindow:events"
+HOT_WINDOW_STREAM_MAXLEN = int(os.getenv("HOT_WINDOW_STREAM_MAXLEN", "100000"))
+HOT_WINDOW_VERIFY_SECONDS = float(os.getenv("HOT_WINDOW_VERIFY_SECONDS", "30"))
+ENABLED = HOT_WINDOW_DAYS > 0
+
+EPOCH = datetime(1970, 1, 1)
+UNKNOWN_DAY = 2 ** 31 - 1
+
+logger = get_logger("hot_window")
+
+
+def transaction_id(session):
+    if not ENABLED:
+        return None
+    return int(session.execute(text("SELECT pg_current_xact_id()::text")).scalar())
+
+
+def publish_rows(xid, rows):
+    """rows: (occurred_at, user_id, event_type, country) of events committed by transaction xid."""
+    if not rows:
+        return
+    payload = orjson.dumps({
+        "xid": xid,
+        "rows": [[(occurred_at - EPOCH) // timedelta(microseconds=1), user_id, event_type, country]
+                 for occurred_at, user_id, event_type, country in rows],
+    })
+    try:
+        get_redis().xadd(
+            HOT_WINDOW_STREAM, {"data": payload}, maxlen=HOT_WINDOW_STREAM_MAXLEN, approximate=True
+        )
+    except redis.RedisError as e:
+        logger.warning("Failed to publish %d rows to the hot window: %s", len(rows), e)
+
+
+def _parse_snapshot(value):
+    xmin, xmax, xip = value.split(":")
+    return int(xmin), int(xmax), {int(x) for x in xip.split(",") if x}
+
+
+def _visible(xid, snapshot):
+    xmin, xmax, xip = snapshot
+    return xid < xmin or (xid < xmax and xid not in xip)
+
+
+class _Dictionary:
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    @property
+    def nbytes(self):
+        return (sys.getsizeof(self.codes) + sys.getsizeof(self.values)
+                + sum(sys.getsizeof(value) + sys.getsizeof(code) for value, code in self.codes.items()))
+
+
+class _DayColumns:
+
+    def __init__(self):
+        self.size = 0
+        self.occurred_at = np.empty(0, dtype=np.int64)
+        self.user = np.empty(0, dtype=np.int32)
+        self.event_type = np.empty(0, dtype=np.int32)
+        self.country = np.empty(0, dtype=np.int32)
+
+    def append(self, occurred_at, user, event_type, country):
+        end = self.size + len(user)
+        if end > len(self.user):
+            capacity = max(end, 2 * len(self.user), 1024)
+            for name in ("occurred_at", "user", "event_type", "country"):
+                grown = np.empty(capacity, dtype=getattr(self, name).dtype)
+                grown[:self.size] = getattr(self, name)[:self.size]
+                setattr(self, name, grown)
+        self.occurred_at[self.size:end] = occurred_at
+        self.user[self.size:end] = user
+        self.event_type[self.size:end] = event_type
+        self.country[self.size:end] = country
+        self.size = end
+
+    @property
+    def nbytes(self):
+        return self.occurred_at.nbytes + self.user.nbytes + self.event_type.nbytes + self.country.nbytes
+
+
+class HotWindow:
+
+    def __init__(self, days=HOT_WINDOW_DAYS):
+        self.days = days
+        self.enabled = days > 0 and np is not None
+        self.stats = Counter()
+        self._task = None
+        self._reset()
+
+    def _reset(self):
+        self.ready = False
+        self._columns = {}
+        self._snapshots = {}
+        self._users = _Dictionary()
+        self._event_types = _Dictionary()
+        self._countries = _Dictionary()
+        self._first_seen = np.empty(0, dtype=np.int32) if np is not None else None
+        self._position = "0-0"
+        self._applied = []
+        self._suspect = set()
+
+    def _window(self, today=None):
+        today = today or date.today()
+        return days_between(today - timedelta(days=self.days - 1), today)
+
+    def _set_first_seen(self, code, day=None):
+        if code >= len(self._first_seen):
+            grown = np.full(max(code + 1, 2 * len(self._first_seen), 1024), UNKNOWN_DAY, dtype=np.int32)
+            grown[:len(self._first_seen)] = self._first_seen
+            self._first_seen = grown
+        if day is not None:
+            self._first_seen[code] = min(self._first_seen[code], day.toordinal())
+
+    def _add_rows(self, day, rows, first_seen):
+        """rows: (occurred_at microseconds, user_id, event_type, country); first_seen: user_id -> date."""
+        columns = self._columns.setdefault(day, _DayColumns())
+        users = []
+        for _, user_id, _, _ in rows:
+            code = self._users.encode(user_id)
+            self._set_first_seen(code, first_seen.get(user_id))
+            users.append(code)
+        columns.append(
+            np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+            np.array(users, dtype=np.int32),
+            np.fromiter((self._event_types.encode(row[2]) for row in rows), dtype=np.int32, count=len(rows)),
+            np.fromiter((self._countries.encode(row[3]) for row in rows), dtype=np.int32, count=len(rows)),
+        )
+
+    async def _load_day(self, session_factory, day):
+        async with session_factory() as session:
+            connection = await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            snapshot = (await connection.execute(text("SELECT pg_current_snapshot()::text"))).scalar()
+            query = text(
+                "SELECT e.occurred_at, e.user_id, e.event_type, coalesce(e.country, '') AS country, f.first_seen "
+                "FROM events e LEFT JOIN user_first_seen f ON f.user_id = e.user_id "
+                "WHERE e.occurred_at >= :start AND e.occurred_at < :end"
+            )
+            start = datetime.combine(day, datetime.min.time())
+            result = await connection.execute(query, {"start": start, "end": start + timedelta(days=1)})
+
+            rows, first_seen = [], {}
+            for occurred_at, user_id, event_type, country, user_first_seen in result:
+                rows.append((
+                    (occurred_at - EPOCH) // timedelta(microseconds=1),
+                    user_id,
+                    event_type,
+                    country,
+                ))
+                if user_first_seen is not None:
+                    first_seen[user_id] = user_first_seen
+
+        self._columns.pop(day, None)
+        self._add_rows(day, rows, first_seen)
+        self._snapshots[day] = _parse_snapshot(snapshot)
+        self.stats["day_loads"] += 1
+
+    async def _first_seen_of(self, session_factory, user_ids):
+        query = text("SELECT user_id, first_seen FROM user_first_seen WHERE user_id IN :ids").bindparams(
+            bindparam("ids", expanding=True)
+        )
+        async with session_factory() as session:
+            return dict((await session.execute(query, {"ids": sorted(user_ids)})).all())
+
+    async def _apply(self, session_factory, message):
+        xid = message["xid"]
+        by_day = defaultdict(list)
+        new_users = set()
+        for row in message["rows"]:
+            day = (EPOCH + timedelta(microseconds=row[0])).date()
+            code = self._users.codes.get(row[1])
+            if code is not None:
+                self._set_first_seen(code, day)
+            if day in self._columns and not _visible(xid, self._snapshots[day]):
+                by_day[day].append(row)
+                if code is None:
+                    new_users.add(row[1])
+
+        first_seen = await self._first_seen_of(session_factory, new_users) if new_users else {}
+        for day, rows in by_day.items():
+            self._add_rows(day, rows, first_seen)
+            self._applied.append((xid, day, len(rows)))
+        self.stats["messages"] += 1
+
+    async def _drain(self, session_factory):
+        client = get_async_redis()
+        block_ms = max(1, int(REDIS_SOCKET_TIMEOUT * 500))
+        while True:
+            response = await client.xread({HOT_WINDOW_STREAM: self._position}, count=100, block=block_ms)
+            if not response:
+                return
+            for _, entries in response:
+                for entry_id, fields in entries:
+                    await self._apply(session_factory, orjson.loads(fields[b"data"]))
+                    self._position = entry_id
+
+    def _prune_users(self):
+        """Drops users with no events left in the window and renumbers the rest."""
+        used = np.zeros(len(self._users.values), dtype=bool)
+        for columns in self._columns.values():
+            used[columns.user[:columns.size]] = True
+        kept = np.flatnonzero(used)
+        renumber = np.zeros(len(used), dtype=np.int32)
+        renumber[kept] = np.arange(len(kept), dtype=np.int32)
+        for columns in self._columns.values():
+            columns.user[:columns.size] = renumber[columns.user[:columns.size]]
+
+        users = _Dictionary()
+        for code in kept:
+            users.encode(self._users.values[code])
+        self._users = users
+        self._first_seen = self._first_seen[kept]
+        self.stats["users_pruned"] += len(used) - len(kept)
+
+    async def _roll(self, session_factory):
+        window = self._window()
+        expired = [day for day in self._columns if day not in window]
+        for day in expired:
+            del self._columns[day]
+            del self._snapshots[day]
+        if expired:
+            self._prune_users()
+        for day in window:
+            if day not in self._columns:
+                await self._load_day(session_factory, day)
+
+    async def _verify(self, session_factory):
+        window = self._window()
+        self._applied = []
+        async with session_factory() as session:
+            connection = await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            snapshot = _parse_snapshot((await connection.execute(text("SELECT pg_current_snapshot()::text"))).scalar())
+            counts = dict((await connection.execute(
+                text("SELECT day, sum(count) FROM daily_event_counts WHERE day BETWEEN :start AND :end GROUP BY day"),
+                {"start": window[0], "end": window[-1]},
+            )).all())
+
+        await self._drain(session_factory)
+        local = {day: columns.size for day, columns in self._columns.items()}
+        for xid, day, count in self._applied:
+            if not _visible(xid, snapshot):
+                local[day] -= count
+
+        drifted = {day for day in window if day in local and local[day] != counts.get(day, 0)}
+        # A transaction can commit before the check and publish right after it, so reload only on a repeat.
+        for day in sorted(drifted & self._suspect):
+            logger.warning("Hot window day %s drifted (%d rows vs %d in Postgres), reloading",
+                           day, local[day], counts.get(day, 0))
+            await self._load_day(session_factory, day)
+            self.stats["day_reloads"] += 1
+        self._suspect = drifted - self._suspect
+
+    async def run(self, session_factory):
+        while True:
+            try:
+                self._reset()
+                latest = await get_async_redis().xrevrange(HOT_WINDOW_STREAM, count=1)
+                self._position = latest[0][0] if latest else "0-0"
+                await self._roll(session_factory)
+                self.ready = True
+                logger.info("Hot window loaded %d days, %d events", len(self._columns), self.rows)
+
+                verify_at = time.monotonic() + HOT_WINDOW_VERIFY_SECONDS
+                while True:
+                    await self._drain(session_factory)
+                    if time.monotonic() >= verify_at:
+                        await self._roll(session_factory)
+                        await self._verify(session_factory)
+                        verify_at = time.monotonic() + HOT_WINDOW_VERIFY_SECONDS
+            except asyncio.CancelledError:
+                raise
+            except (redis.RedisError, SQLAlchemyError, OSError) as e:
+                logger.warning("Hot window unavailable, queries fall back to Postgres: %s", e)
+                self.ready = False
+                self.stats["errors"] += 1
+                await asyncio.sleep(5)
+            except Exception:
+                # E.g. a malformed stream entry: the window may be half-updated, so it is reloaded from scratch.
+                logger.exception("Hot window failed, queries fall back to Postgres until it is reloaded")
+                self.ready = False
+                self.stats["errors"] += 1
+                await asyncio.sleep(5)
+
+    def start(self, session_factory):
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run(session_factory))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def covers(self, from_dt, to_dt):
+        return self.ready and all(day in self._columns for day in days_between(from_dt, to_dt))
+
+    def _distinct_users(self, codes):
+        seen = np.zeros(len(self._users.values), dtype=bool)
+        seen[codes] = True
+        return int(np.count_nonzero(seen))
+
+    def dau(self, from_dt, to_dt, country=None):
+        """[(day, distinct users)] for days with events, or None when the range is not in the window."""
+        if not self.covers(from_dt, to_dt):
+            return None
+        self.stats["hits"] += 1
+        country_code = self._countries.codes.get(country) if country else None
+        if country and country_code is None:
+            return []
+
+        result = []
+        for day in days_between(from_dt, to_dt):
+            columns = self._columns[day]
+            users = columns.user[:columns.size]
+            if country:
+                users = users[columns.country[:columns.size] == country_code]
+            if len(users):
+                result.append((day, self._distinct_users(users)))
+        return result
+
+    def top_events(self, from_dt, to_dt, limit):
+        """[(event_type, count)] ordered like the SQL path: count desc, then event_type."""
+        if not self.covers(from_dt, to_dt):
+            return None
+        self.stats["hits"] += 1
+        counts = np.zeros(len(self._event_types.values), dtype=np.int64)
+        for day in days_between(from_dt, to_dt):
+            columns = self._columns[day]
+            counts += np.bincount(columns.event_type[:columns.size], minlength=len(counts))
+
+        names = self._event_types.values
+        ranked = sorted((code for code in np.flatnonzero(counts)), key=lambda code: (-counts[code], names[code]))
+        return [(names[code], int(counts[code])) for code in ranked[:limit]]
+
+    def retention(self, start_dt, windows):
+        """(cohort size, [returning users for day 1..windows]) or None when not in the window."""
+        if not self.covers(start_dt, start_dt + timedelta(days=windows)):
+            return None
+        self.stats["hits"] += 1
+        cohort = self._first_seen[:len(self._users.values)] == start_dt.toordinal()
+        cohort_size = int(np.count_nonzero(cohort))
+        if cohort_size == 0:
+            return 0, []
+
+        returning = []
+        for offset in range(1, windows + 1):
+            columns = self._columns[start_dt + timedelta(days=offset)]
+            users = columns.user[:columns.size]
+            returning.append(self._distinct_users(users[cohort[users]]))
+        return cohort_size, returning
+
+    @property
+    def rows(self):
+        return sum(columns.size for columns in self._columns.values())
+
+    def info(self):
+        if not self.enabled:
+            return {"enabled": False, "numpy": np is not None}
+        rows = self.rows
+        array_bytes = sum(columns.nbytes for columns in self._columns.values()) + self._first_seen.nbytes
+        dictionary_bytes = self._users.nbytes + self._event_types.nbytes + self._countries.nbytes
+        nbytes = array_bytes + dictionary_bytes
+        return {
+            "enabled": True,
+            "ready": self.ready,
+            "days": sorted(day.isoformat() for day in self._columns),
+            "events": rows,
+            "users": len(self._users.values),
+            "event_types": len(self._event_types.values),
+            "countries": len(self._countries.values),
+            "array_bytes": array_bytes,
+            "dictionary_bytes": dictionary_bytes,
+            "bytes_per_million_events": round(nbytes / rows * 1_000_000) if rows else None,
+            **self.stats,
+        }
+
+
+hot_window = HotWindow()
@@ -0,0 +1,385 @@
+import json
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import delete, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from app.cache import invalidate_all, invalidate_days
+from app.heavy_hitters import TOP_VALUES_PROPERTIES, SpaceSaving
+from app.hll import HyperLogLog
+from app.hot_window import publish_rows, transaction_id
+from app.models import (
+    PROMOTED_PROPERTIES, Event, EventId, UserFirstSeen, DailyEventCount, DailyUserActivity, DailyUserSketch,
+    DailyPropertySketch,
+)
+from app.partitions import ensure_partitions
+
+# Rows inserted by one insert_from_staging call, for the set-based rollup updates that follow.
+INSERTED_TABLE = "events_inserted"
+
+
+def utc_naive(value):
+    """occurred_at as stored in events (timestamp without time zone): naive UTC."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def property_text(value):
+    # Same text as properties ->> key: promoted columns, rollups, sketches and the hot window all key on it.
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _country(properties):
+    return property_text((properties or {}).get("country")) or ""
+
+
+def promoted_columns(properties):
+    return {key: property_text((properties or {}).get(key)) for key in PROMOTED_PROPERTIES}
+
+
+def _keep_earliest(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"first_seen": stmt.excluded.first_seen},
+        where=stmt.excluded.first_seen < UserFirstSeen.first_seen,
+    )
+
+
+def record_first_seen(session, rows):
+    first_seen = {}
+    for row in rows:
+        day = utc_naive(row["occurred_at"]).date()
+        if row["user_id"] not in first_seen or day < first_seen[row["user_id"]]:
+            first_seen[row["user_id"]] = day
+
+    if not first_seen:
+        return False
+
+    stmt = insert(UserFirstSeen).values(
+        [{"user_id": user_id, "first_seen": day} for user_id, day in sorted(first_seen.items())]
+    )
+    stmt = _keep_earliest(stmt).returning(text("xmax::text <> '0'"))
+    return any(session.execute(stmt).scalars())
+
+
+def record_rollups(session, rows):
+    event_counts = Counter()
+    activity = set()
+    for row in rows:
+        day = utc_naive(row["occurred_at"]).date()
+        event_counts[(day, row["event_type"])] += 1
+        activity.add((day, _country(row.get("properties")), row["user_id"]))
+
+    if event_counts:
+        stmt = insert(DailyEventCount).values(
+            [{"day": day, "event_type": event_type, "count": count}
+             for (day, event_type), count in sorted(event_counts.items())]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "event_type"],
+            set_={"count": DailyEventCount.count + stmt.excluded.count},
+        )
+        session.execute(stmt)
+
+    if activity:
+        stmt = insert(DailyUserActivity).values(
+            [{"day": day, "country": country, "user_id": user_id} for day, country, user_id in sorted(activity)]
+        )
+        session.execute(stmt.on_conflict_do_nothing())
+
+
+def merge_sketches(session, sketches):
+    if not sketches:
+        return
+
+    keys = sorted(sketches)
+    empty = HyperLogLog().to_bytes()
+    stmt = insert(DailyUserSketch).values(
+        [{"day": day, "country": country, "registers": empty} for day, country in keys]
+    )
+    session.execute(stmt.on_conflict_do_nothing())
+
+    stored = session.execute(
+        select(DailyUserSketch)
+        .where(tuple_(DailyUserSketch.day, DailyUserSketch.country).in_(keys))
+        .order_by(DailyUserSketch.day, DailyUserSketch.country)
+        .with_for_update()
+    ).scalars()
+    for row in stored:
+        merged = HyperLogLog.from_bytes(row.registers).merge(sketches[(row.day, row.country)])
+        row.registers = merged.to_bytes()
+    session.flush()
+
+
+def record_sketches(session, rows):
+    sketches = {}
+    for row in rows:
+        key = (utc_naive(row["occurred_at"]).date(), _country(row.get("properties")))
+        sketches.setdefault(key, HyperLogLog()).add(row["user_id"])
+    merge_sketches(session, sketches)
+
+
+def merge_property_sketches(session, sketches):
+    if not sketches:
+        return
+
+    keys = sorted(sketches)
+    empty = SpaceSaving().to_bytes()
+    stmt = insert(DailyPropertySketch).values(
+        [{"day": day, "property": key, "counters": empty} for day, key in keys]
+    )
+    session.execute(stmt.on_conflict_do_nothing())
+
+    stored = session.execute(
+        select(DailyPropertySketch)
+        .where(tuple_(DailyPropertySketch.day, DailyPropertySketch.property).in_(keys))
+        .order_by(DailyPropertySketch.day, DailyPropertySketch.property)
+        .with_for_update()
+    ).scalars()
+    for row in stored:
+        merged = SpaceSaving.from_bytes(row.counters).merge(sketches[(row.day, row.property)])
+        row.counters = merged.to_bytes()
+    session.flush()
+
+
+def record_property_sketches(session, rows):
+    counts = {}
+    for row in rows:
+        properties = row.get("properties") or {}
+        day = utc_naive(row["occurred_at"]).date()
+        for key in TOP_VALUES_PROPERTIES:
+            value = property_text(properties.get(key))
+            if value is not None:
+                counts.setdefault((day, key), Counter())[value] += 1
+    merge_property_sketches(session, {key: SpaceSaving.from_counts(c) for key, c in counts.items()})
+
+
+def record_inserted(session, rows):
+    cohorts_moved = record_first_seen(session, rows)
+    record_rollups(session, rows)
+    record_sketches(session, rows)
+    record_property_sketches(session, rows)
+    return cohorts_moved
+
+
+def invalidate_inserted(rows, cohorts_moved, xid=None):
+    invalidate_days({utc_naive(row["occurred_at"]).date() for row in rows})
+    if cohorts_moved:
+        invalidate_all()
+    if xid is not None:
+        publish_rows(xid, [
+            (row["occurred_at"], row["user_id"], row["event_type"], _country(row["properties"])) for row in rows
+        ])
+
+
+def claim_event_ids(session, batch):
+    by_id = {}
+    for row in batch:
+        by_id.setdefault(uuid.UUID(str(row["event_id"])), row)
+
+    stmt = (
+        insert(EventId)
+        .values([
+            {"event_id": event_id, "occurred_at": utc_naive(by_id[event_id]["occurred_at"])}
+            for event_id in sorted(by_id)
+        ])
+        .on_conflict_do_nothing()
+        .returning(EventId.event_id)
+    )
+    return [by_id[event_id] for event_id in session.execute(stmt).scalars()]
+
+
+def insert_new_events(session, batch):
+    """Inserts the events whose event_id was not seen before; returns the ids (UUID) of those inserted."""
+    new_events = claim_event_ids(session, batch)
+    if not new_events:
+        session.commit()
+        return set()
+
+    ensure_partitions(session, {utc_naive(row["occurred_at"]).date() for row in new_events})
+    stmt = (
+        insert(Event)
+        .values([
+            {**row, "occurred_at": utc_naive(row["occurred_at"]), **promoted_columns(row.get("properties"))}
+            for row in new_events
+        ])
+        .on_conflict_do_nothing()
+        .returning(Event.event_id, Event.occurred_at, Event.user_id, Event.event_type, Event.properties)
+    )
+    inserted = session.execute(stmt).mappings().all()
+    cohorts_moved = record_inserted(session, inserted)
+    xid = transaction_id(session)
+    session.commit()
+    invalidate_inserted(inserted, cohorts_moved, xid)
+    return {row["event_id"] for row in inserted}
+
+
+def insert_events_batch(session, batch):
+    return len(insert_new_events(session, batch))
+
+
+def insert_from_staging(session, staging_table):
+    """COPY path of import_events.py: the inserted rows stay in Postgres and the rollups are updated set-based."""
+    days = session.execute(text(f"SELECT DISTINCT occurred_at::date FROM {staging_table}")).scalars().all()
+    ensure_partitions(session, days)
+    promoted = ", ".join(PROMOTED_PROPERTIES)
+    promoted_values = ", ".join(f"s.properties ->> '{key}'" for key in PROMOTED_PROPERTIES)
+    session.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {INSERTED_TABLE} "
+        f"(occurred_at timestamp, user_id text, event_type text, country text, properties jsonb) "
+        f"ON COMMIT DELETE ROWS"
+    ))
+
+    inserted = session.execute(text(
+        f"WITH claimed AS ("
+        f" INSERT INTO event_ids (event_id, occurred_at)"
+        f" SELECT DISTINCT ON (event_id) event_id, occurred_at FROM {staging_table} ORDER BY event_id"
+        f" ON CONFLICT DO NOTHING RETURNING event_id, occurred_at"
+        f"), inserted AS ("
+        f" INSERT INTO events (event_id, occurred_at, user_id, event_type, properties, {promoted})"
+        f" SELECT DISTINCT ON (s.event_id) s.event_id, s.occurred_at, s.user_id, s.event_type, s.properties,"
+        f" {promoted_values}"
+        f" FROM {staging_table} s JOIN claimed USING (event_id, occurred_at)"
+        f" ON CONFLICT DO NOTHING"
+        f" RETURNING occurred_at, user_id, event_type, country, properties"
+        f") "
+        f"INSERT INTO {INSERTED_TABLE} SELECT * FROM inserted"
+    )).rowcount
+    if not inserted:
+        session.commit()
+        return 0
+
+    cohorts_moved = any(session.execute(text(
+        f"INSERT INTO user_first_seen (user_id, first_seen) "
+        f"SELECT user_id, min(occurred_at)::date FROM {INSERTED_TABLE} GROUP BY user_id ORDER BY user_id "
+        f"ON CONFLICT (user_id) DO UPDATE SET first_seen = excluded.first_seen "
+        f"WHERE excluded.first_seen < user_first_seen.first_seen "
+        f"RETURNING xmax::text <> '0'"
+    )).scalars())
+    inserted_days = set(session.execute(text(
+        f"INSERT INTO daily_event_counts (day, event_type, count) "
+        f"SELECT occurred_at::date, event_type, count(*) FROM {INSERTED_TABLE} GROUP BY 1, 2 ORDER BY 1, 2 "
+        f"ON CONFLICT (day, event_type) DO UPDATE SET count = daily_event_counts.count + excluded.count "
+        f"RETURNING day"
+    )).scalars())
+
+    # A (day, country, user) already in the rollup is already counted by that day's sketch.
+    sketches = {}
+    for day, country, user_id in session.execute(text(
+        f"INSERT INTO daily_user_activity (day, country, user_id) "
+        f"SELECT DISTINCT occurred_at::date, coalesce(country, ''), user_id FROM {INSERTED_TABLE} ORDER BY 1, 2, 3 "
+        f"ON CONFLICT DO NOTHING RETURNING day, country, user_id"
+    )):
+        sketches.setdefault((day, country), HyperLogLog()).add(user_id)
+    merge_sketches(session, sketches)
+
+    counts = {}
+    for day, key, value, count in session.execute(text(
+        f"SELECT occurred_at::date, key, properties ->> key, count(*) "
+        f"FROM {INSERTED_TABLE}, unnest(CAST(:keys AS text[])) AS key "
+        f"WHERE properties ->> key IS NOT NULL GROUP BY 1, 2, 3"
+    ), {"keys": TOP_VALUES_PROPERTIES}):
+        counts.setdefault((day, key), Counter())[value] = count
+    merge_property_sketches(session, {key: SpaceSaving.from_counts(c) for key, c in counts.items()})
+
+    xid = transaction_id(session)
+    hot_rows = session.execute(text(
+        f"SELECT occurred_at, user_id, event_type, coalesce(country, '') FROM {INSERTED_TABLE}"
+    )).all() if xid is not None else []
+    session.commit()
+    invalidate_days(inserted_days)
+    if cohorts_moved:
+        invalidate_all()
+    if xid is not None:
+        publish_rows(xid, hot_rows)
+    return inserted
+
+
+def backfill_first_seen(session):
+    source = (
+        select(Event.user_id, func.min(func.date(Event.occurred_at)))
+        .group_by(Event.user_id)
+    )
+    stmt = insert(UserFirstSeen).from_select(["user_id", "first_seen"], source)
+    stmt = _keep_earliest(stmt)
+    result = session.execute(stmt)
+    session.commit()
+    invalidate_all()
+    return result.rowcount
+
+
+def rebuild_rollups(session):
+    session.execute(delete(DailyEventCount))
+    session.execute(delete(DailyUserActivity))
+
+    day = func.date(Event.occurred_at)
+    event_counts = select(day, Event.event_type, func.count()).group_by(day, Event.event_type)
+    result = session.execute(
+        insert(DailyEventCount).from_select(["day", "event_type", "count"], event_counts)
+    )
+    rowcount = result.rowcount
+
+    country = func.coalesce(Event.country, "")
+    activity = select(day, country, Event.user_id).distinct()
+    result = session.execute(
+        insert(DailyUserActivity).from_select(["day", "country", "user_id"], activity)
+    )
+    rowcount += result.rowcount
+
+    session.commit()
+    invalidate_all()
+    return rowcount
+
+
+def rebuild_sketches(session):
+    session.execute(delete(DailyUserSketch))
+
+    sketches = {}
+    activity = session.execute(
+        select(DailyUserActivity.day, DailyUserActivity.country, DailyUserActivity.user_id)
+        .execution_options(yield_per=10000)
+    )
+    for day, country, user_id in activity:
+        sketches.setdefault((day, country), HyperLogLog()).add(user_id)
+
+    merge_sketches(session, sketches)
+    session.commit()
+    invalidate_all()
+    return len(sketches)
+
+
+def rebuild_property_sketches(session):
+    session.execute(delete(DailyPropertySketch))
+
+    day = func.date(Event.occurred_at)
+    rebuilt = 0
+    for key in TOP_VALUES_PROPERTIES:
+        value = PROMOTED_PROPERTIES.get(key, Event.properties[key].astext)
+        counts = session.execute(
+            select(day, value, func.count())
+            .where(value.isnot(None))
+            .group_by(day, value)
+            .order_by(day)
+            .execution_options(yield_per=10000)
+        )
+        current_day, day_counts = None, {}
+        for counted_day, counted_value, count in counts:
+            if counted_day != current_day and day_counts:
+                merge_property_sketches(session, {(current_day, key): SpaceSaving.from_counts(day_counts)})
+                rebuilt += 1
+                day_counts = {}
+            current_day = counted_day
+            day_counts[counted_value] = count
+        if day_counts:
+            merge_property_sketches(session, {(current_day, key): SpaceSaving.from_counts(day_counts)})
+            rebuilt += 1
+
+    session.commit()
+    invalidate_all()
+    return rebuilt
@@ -0,0 +1,163 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def _parse_settings(value):
+    settings = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, number = item.partition("=")
+        settings[name.strip()] = float(number)
+    return settings
+
+
+# "events_api=0.1,events_worker=0.5": keep that fraction of INFO/DEBUG records.
+LOG_SAMPLING = _parse_settings(os.getenv("LOG_SAMPLING", ""))
+# "events_api=100": at most that many INFO/DEBUG records per second, excess is counted in "suppressed".
+LOG_RATE_LIMITS = _parse_settings(os.getenv("LOG_RATE_LIMITS", "events_api=100,events_worker=100"))
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc_info"] = record.exc_text
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Drops a share of INFO/DEBUG records before they are queued; warnings and errors always pass."""
+
+    def __init__(self, sample_rate=1.0, per_second=None):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.per_second = per_second
+        self._tokens = per_second or 0
+        self._updated = time.monotonic()
+        self._suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+
+        with self._lock:
+            if self.per_second is not None:
+                now = time.monotonic()
+                self._tokens = min(self.per_second, self._tokens + (now - self._updated) * self.per_second)
+                self._updated = now
+                if self._tokens < 1:
+                    self._suppressed += 1
+                    return False
+                self._tokens -= 1
+            if self._suppressed:
+                record.suppressed = self._suppressed
+                self._suppressed = 0
+
+        if self.sample_rate < 1:
+            record.sample_rate = self.sample_rate
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+
+    def prepare(self, record):
+        # Message formatting is left to the listener thread; only the traceback has to be captured here.
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+_queue = queue.Queue(LOG_QUEUE_SIZE)
+_handlers = []
+_queue_handlers = []
+_listener = None
+_lock = threading.Lock()
+
+
+def _start_listener():
+    global _listener
+    _listener = QueueListener(_queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_after_fork():
+    # The listener thread does not survive fork (Celery prefork workers), so the child gets its own.
+    global _queue, _lock
+    _lock = threading.Lock()
+    _queue = queue.Queue(LOG_QUEUE_SIZE)
+    for handler in _queue_handlers:
+        handler.queue = _queue
+    if _listener is not None:
+        _start_listener()
+
+
+def _add_handler(handler):
+    handler.setFormatter(JsonFormatter())
+    _handlers.append(handler)
+    if _listener is not None:
+        _listener.handlers = tuple(_handlers)
+
+
+def get_logger(name, log_file=None):
+    logger = logging.getLogger(name)
+    with _lock:
+        if any(isinstance(h, _NonBlockingQueueHandler) for h in logger.handlers):
+            return logger
+
+        if not _handlers:
+            _add_handler(logging.StreamHandler())
+        if log_file:
+            file_handler = logging.FileHandler(log_file)
+            file_handler.addFilter(logging.Filter(name))
+            _add_handler(file_handler)
+        if _listener is None:
+            _start_listener()
+
+        queue_handler = _NonBlockingQueueHandler(_queue)
+        _queue_handlers.append(queue_handler)
+        logger.addHandler(queue_handler)
+        logger.addFilter(SamplingFilter(LOG_SAMPLING.get(name, 1.0), LOG_RATE_LIMITS.get(name)))
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+    return logger
+
+
+atexit.register(_stop_listener)
+os.register_at_fork(after_in_child=_restart_after_fork)
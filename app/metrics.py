@@ -0,0 +1,57 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BATCH_BUCKETS = (1, 10, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+EVENTS_RECEIVED = Counter("events_received_total", "Events received by the ingest API", ["endpoint"])
+EVENTS_REJECTED = Counter("events_rejected_total", "Events rejected by ingest validation", ["endpoint"])
+EVENTS_QUEUED = Counter("events_queued_total", "Events handed to insert_events_task", ["endpoint"])
+EVENTS_DUPLICATE_DROPPED = Counter(
+    "events_duplicate_dropped_total", "Duplicate events dropped before the queue", ["endpoint"]
+)
+EVENTS_EXPORTED = Counter("events_exported_total", "Events streamed by GET /events/export", ["format"])
+DEDUP_UNCONFIRMED = Counter(
+    "ingest_dedup_unconfirmed_total", "Events flagged by the dedup filter but not found in event_ids"
+)
+INGEST_FLUSH_EVENTS = Histogram(
+    "ingest_flush_events", "Events per Celery message sent by the API", buckets=BATCH_BUCKETS
+)
+INGEST_DISPATCH_SECONDS = Histogram(
+    "ingest_dispatch_seconds", "Time to publish one insert_events_task message", buckets=LATENCY_BUCKETS
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+
+WORKER_BATCH_EVENTS = Histogram(
+    "worker_batch_events", "Events per insert_events_task DB batch", buckets=BATCH_BUCKETS
+)
+WORKER_BATCH_DB_SECONDS = Histogram(
+    "worker_batch_db_seconds", "DB time per insert_events_task batch", buckets=LATENCY_BUCKETS
+)
+WORKER_EVENTS_INSERTED = Counter("worker_events_inserted_total", "Events inserted by the worker")
+WORKER_EVENTS_DUPLICATE = Counter("worker_events_duplicate_total", "Duplicate events skipped by the worker")
+
+STATS_QUERY_SECONDS = Histogram(
+    "stats_query_seconds", "SQL time per /stats endpoint (cache misses only)", ["endpoint"], buckets=LATENCY_BUCKETS
+)
+
+
+def render_metrics():
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,16 +1,83 @@
-from sqlalchemy import Column, String, TIMESTAMP
+from sqlalchemy import Column, String, TIMESTAMP, Date, BigInteger, LargeBinary, Index, DDL
 from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.event import listen
 from .database import Base
 import uuid
 
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        Index("ix_events_occurred_at", "occurred_at"),
+        Index("ix_events_user_id_occurred_at", "user_id", "occurred_at"),
+        Index("ix_events_event_type_occurred_at", "event_type", "occurred_at"),
+        Index("ix_events_country_occurred_at", "country", "occurred_at"),
+        Index("ix_events_session_id", "session_id"),
+        Index(
+            "ix_events_properties", "properties",
+            postgresql_using="gin", postgresql_ops={"properties": "jsonb_path_ops"},
+        ),
+        {"postgresql_partition_by": "RANGE (occurred_at)"},
+    )
 
     event_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    occurred_at = Column(TIMESTAMP, nullable=False)
+    occurred_at = Column(TIMESTAMP, primary_key=True, nullable=False)
     user_id = Column(String, nullable=False)
     event_type = Column(String, nullable=False)
     properties = Column(JSONB, nullable=True)
+    # Promoted properties: copies of properties->>key filled at insert time.
+    country = Column(String, nullable=True)
+    session_id = Column(String, nullable=True)
 
 
+# To promote another property add a column (and migration) above and list it here.
+PROMOTED_PROPERTIES = {"country": Event.country, "session_id": Event.session_id}
 
+listen(Event.__table__, "after_create", DDL("CREATE TABLE events_default PARTITION OF events DEFAULT"))
+
+
+class EventId(Base):
+    __tablename__ = "event_ids"
+    __table_args__ = (Index("ix_event_ids_occurred_at", "occurred_at"),)
+
+    event_id = Column(UUID(as_uuid=True), primary_key=True)
+    # occurred_at of the stored event, so claims are pruned together with a detached partition.
+    occurred_at = Column(TIMESTAMP, nullable=True)
+
+
+class UserFirstSeen(Base):
+    __tablename__ = "user_first_seen"
+
+    user_id = Column(String, primary_key=True)
+    first_seen = Column(Date, nullable=False, index=True)
+
+
+class DailyEventCount(Base):
+    __tablename__ = "daily_event_counts"
+
+    day = Column(Date, primary_key=True)
+    event_type = Column(String, primary_key=True)
+    count = Column(BigInteger, nullable=False)
+
+
+class DailyUserActivity(Base):
+    __tablename__ = "daily_user_activity"
+
+    day = Column(Date, primary_key=True)
+    country = Column(String, primary_key=True, server_default="")
+    user_id = Column(String, primary_key=True)
+
+
+class DailyUserSketch(Base):
+    __tablename__ = "daily_user_sketches"
+
+    day = Column(Date, primary_key=True)
+    country = Column(String, primary_key=True, server_default="")
+    registers = Column(LargeBinary, nullable=False)
+
+
+class DailyPropertySketch(Base):
+    __tablename__ = "daily_property_sketches"
+
+    day = Column(Date, primary_key=True)
+    property = Column(String, primary_key=True)
+    counters = Column(LargeBinary, nullable=False)
@@ -0,0 +1,113 @@
+import os
+import zlib
+from datetime import date, timedelta
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+PARTITION_INTERVAL = os.getenv("EVENTS_PARTITION_INTERVAL", "month")
+DEFAULT_PARTITION = "events_default"
+
+_known_partitions = set()
+
+
+# Partitions checked or created in a transaction are cached only once it commits: after a rollback the DDL is
+# gone, and a stale entry would send that range to the default partition for the life of the process.
+@event.listens_for(Session, "after_commit")
+def _remember_partitions(session):
+    _known_partitions.update(session.info.pop("pending_partitions", ()))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_partitions(session, previous_transaction):
+    session.info.pop("pending_partitions", None)
+
+
+def partition_bounds(day, interval=PARTITION_INTERVAL):
+    if interval == "day":
+        return day, day + timedelta(days=1)
+    if interval == "month":
+        start = day.replace(day=1)
+        end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        return start, end
+    raise ValueError(f"Unsupported partition interval: {interval}")
+
+
+def partition_name(start, interval=PARTITION_INTERVAL):
+    if interval == "day":
+        return f"events_p{start:%Y_%m_%d}"
+    return f"events_p{start:%Y_%m}"
+
+
+def create_partition(session, day):
+    start, end = partition_bounds(day)
+    name = partition_name(start)
+
+    session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": zlib.crc32(name.encode())})
+    if session.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+        return False
+
+    bounds = {"start": start, "end": end}
+    session.execute(text(f"CREATE TABLE {name} (LIKE events INCLUDING DEFAULTS)"))
+    session.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE occurred_at >= :start AND occurred_at < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds)
+    session.execute(text(f"ALTER TABLE events ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+    return True
+
+
+def ensure_partitions(session, days):
+    starts = {partition_bounds(day)[0] for day in days} - _known_partitions
+    for start in sorted(starts):
+        create_partition(session, start)
+        session.info.setdefault("pending_partitions", set()).add(start)
+
+
+def create_partitions_ahead(session, count, today=None):
+    start = partition_bounds(today or date.today())[0]
+    created = []
+    for _ in range(count):
+        if create_partition(session, start):
+            created.append(partition_name(start))
+        start = partition_bounds(start)[1]
+    session.commit()
+    return created
+
+
+def list_partitions(session):
+    rows = session.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = 'events' AND child.relname <> :default "
+        "ORDER BY child.relname"
+    ), {"default": DEFAULT_PARTITION})
+    return [row[0] for row in rows]
+
+
+def _partition_range(name):
+    parts = [int(p) for p in name[len("events_p"):].split("_")]
+    if len(parts) == 3:
+        return partition_bounds(date(*parts), "day")
+    return partition_bounds(date(parts[0], parts[1], 1), "month")
+
+
+def detach_partitions_before(session, cutoff, drop=False):
+    """Detaches (or drops) partitions ending by cutoff and releases their event_ids claims."""
+    detached = []
+    for name in list_partitions(session):
+        start, end = _partition_range(name)
+        if end <= cutoff:
+            session.execute(text(f"ALTER TABLE events DETACH PARTITION {name}"))
+            if drop:
+                session.execute(text(f"DROP TABLE {name}"))
+            # The range now has no events, so its ids may be imported again.
+            session.execute(
+                text("DELETE FROM event_ids WHERE occurred_at >= :start AND occurred_at < :end"),
+                {"start": start, "end": end},
+            )
+            _known_partitions.discard(start)
+            detached.append(name)
+    session.commit()
+    return detached
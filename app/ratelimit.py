@@ -0,0 +1,152 @@
+import math
+import os
+import time
+from collections import OrderedDict
+
+import redis
+
+from app.logging_setup import get_logger
+from app.redis_client import get_async_redis
+
+LOCAL_BATCH = int(os.getenv("RATE_LIMIT_LOCAL_BATCH", "5"))
+LOCAL_LEASE_SECONDS = float(os.getenv("RATE_LIMIT_LOCAL_LEASE_SECONDS", "1"))
+MAX_LOCAL_LEASES = 10000
+
+logger = get_logger("rate_limit")
+
+# Refills the bucket from the elapsed server time and grants up to ARGV[3] tokens.
+# Returns {granted, tokens left, retry after in ms}.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate / 1000)
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) * 1000 / rate) + 1000)
+local retry_after = 0
+if granted == 0 then
+    retry_after = math.ceil((1 - tokens) * 1000 / rate)
+end
+return {granted, math.floor(tokens), retry_after}
+"""
+
+
+class RateLimit:
+
+    def __init__(self, name, capacity, per_second):
+        self.name = name
+        self.capacity = capacity
+        self.per_second = per_second
+
+
+def _limit_from_env(name, capacity, per_second):
+    prefix = f"RATE_LIMIT_{name.upper()}"
+    return RateLimit(
+        name,
+        int(os.getenv(f"{prefix}_BURST", str(capacity))),
+        float(os.getenv(f"{prefix}_PER_SEC", str(per_second))),
+    )
+
+
+ROUTE_LIMITS = {
+    "/events": _limit_from_env("events", 100, 20),
+    "/stats": _limit_from_env("stats", 60, 10),
+    "/users": _limit_from_env("users", 200, 100),
+}
+
+
+def limit_for_path(path):
+    for prefix, limit in ROUTE_LIMITS.items():
+        if path == prefix or path.startswith(prefix + "/"):
+            return limit
+    return None
+
+
+def client_key(request):
+    api_key = request.headers.get("x-api-key")
+    if api_key:
+        return f"key:{api_key}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class RateLimitDecision:
+
+    def __init__(self, allowed, limit, remaining, retry_after=0):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.retry_after = retry_after
+
+    def headers(self):
+        headers = {
+            "X-RateLimit-Limit": str(self.limit.capacity),
+            "X-RateLimit-Remaining": str(max(self.remaining, 0)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class TokenBucketLimiter:
+
+    def __init__(self, local_batch=LOCAL_BATCH, lease_seconds=LOCAL_LEASE_SECONDS):
+        self.local_batch = local_batch
+        self.lease_seconds = lease_seconds
+        self._leases = OrderedDict()
+        self._script = None
+
+    def _bucket_script(self):
+        client = get_async_redis()
+        if self._script is None or self._script.registered_client is not client:
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        return self._script
+
+    def _take_local(self, key):
+        lease = self._leases.get(key)
+        if lease is None:
+            return None
+        tokens, remaining, expires = lease
+        if tokens <= 0 or time.monotonic() >= expires:
+            del self._leases[key]
+            return None
+        self._leases[key] = (tokens - 1, remaining, expires)
+        return remaining + tokens - 1
+
+    def _store_lease(self, key, tokens, remaining):
+        self._leases[key] = (tokens, remaining, time.monotonic() + self.lease_seconds)
+        self._leases.move_to_end(key)
+        while len(self._leases) > MAX_LOCAL_LEASES:
+            self._leases.popitem(last=False)
+
+    async def acquire(self, limit, client):
+        key = f"ratelimit:{limit.name}:{client}"
+
+        remaining = self._take_local(key)
+        if remaining is not None:
+            return RateLimitDecision(True, limit, remaining)
+
+        requested = max(1, min(self.local_batch, limit.capacity))
+        try:
+            granted, remaining, retry_after_ms = await self._bucket_script()(
+                keys=[key], args=[limit.capacity, limit.per_second, requested]
+            )
+        except redis.RedisError as e:
+            logger.warning("Rate limiter unavailable, allowing request: %s", e)
+            return RateLimitDecision(True, limit, limit.capacity)
+
+        if granted == 0:
+            return RateLimitDecision(False, limit, 0, retry_after_ms / 1000)
+
+        if granted > 1:
+            self._store_lease(key, granted - 1, remaining)
+        return RateLimitDecision(True, limit, remaining + granted - 1)
+
+
+rate_limiter = TokenBucketLimiter()
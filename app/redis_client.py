@@ -0,0 +1,27 @@
+import asyncio
+import os
+
+import redis
+import redis.asyncio as aioredis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+
+_sync_client = None
+_async_clients = {}
+
+
+def get_redis():
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(REDIS_URL, socket_timeout=REDIS_SOCKET_TIMEOUT)
+    return _sync_client
+
+
+def get_async_redis():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        _async_clients.clear()
+        client = _async_clients[loop] = aioredis.Redis.from_url(REDIS_URL, socket_timeout=REDIS_SOCKET_TIMEOUT)
+    return client
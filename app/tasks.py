@@ -1,42 +1,58 @@
-import json
+import time
+import uuid
 
 from celery_app import celery_app
-from app.models import Event
 from app.database import SessionLocal
-from sqlalchemy.dialects.postgresql import insert
+from app.ingest import insert_new_events
+from app.logging_setup import get_logger
+from app.metrics import WORKER_BATCH_DB_SECONDS, WORKER_BATCH_EVENTS, WORKER_EVENTS_DUPLICATE, WORKER_EVENTS_INSERTED
+
+logger = get_logger("events_worker")
+
+def segment_results(events, segments, inserted_ids):
+    """Outcome of each [offset, length] slice of events; an id repeated across slices counts once, in the first."""
+    credited = set()
+    results = []
+    for offset, length in segments:
+        inserted = 0
+        for event in events[offset:offset + length]:
+            event_id = uuid.UUID(str(event["event_id"]))
+            if event_id in inserted_ids and event_id not in credited:
+                credited.add(event_id)
+                inserted += 1
+        results.append({"offset": offset, "length": length, "inserted": inserted, "duplicates": length - inserted})
+    return results
 
-import logging
-
-logger = logging.getLogger("events_worker")
-logger.setLevel(logging.INFO)
-handler = logging.StreamHandler()
-formatter = logging.Formatter(json.dumps({
-    "time": "%(asctime)s",
-    "level": "%(levelname)s",
-    "message": "%(message)s"
-}))
-handler.setFormatter(formatter)
-logger.addHandler(handler)
 
 @celery_app.task
-def insert_events_task(events: list[dict]):
+def insert_events_task(events: list[dict], segments: list[list[int]] = None):
+    """segments: [offset, length] of each request coalesced into events; their outcomes are returned in order."""
     session = SessionLocal()
     inserted_count = 0
     duplicate_count = 0
+    inserted_ids = set()
     BATCH_SIZE = 200
 
     for i in range(0, len(events), BATCH_SIZE):
         batch = events[i:i + BATCH_SIZE]
 
-        stmt = insert(Event).values(batch).on_conflict_do_nothing(index_elements=["event_id"])
-        result = session.execute(stmt)
-        session.commit()
+        batch_start = time.perf_counter()
+        batch_ids = insert_new_events(session, batch)
+        inserted_ids |= batch_ids
+        rowcount = len(batch_ids)
+        WORKER_BATCH_DB_SECONDS.observe(time.perf_counter() - batch_start)
+        WORKER_BATCH_EVENTS.observe(len(batch))
+        WORKER_EVENTS_INSERTED.inc(rowcount)
+        WORKER_EVENTS_DUPLICATE.inc(len(batch) - rowcount)
 
-        inserted_count += result.rowcount
-        duplicate_count += len(batch) - result.rowcount
+        inserted_count += rowcount
+        duplicate_count += len(batch) - rowcount
 
-        logger.info(f"Worker processed batch: inserted={result.rowcount}, duplicates={len(batch)-result.rowcount}")
+        logger.info("Worker processed batch: inserted=%d, duplicates=%d", rowcount, len(batch) - rowcount)
 
-    logger.info(f"Total processed: inserted={inserted_count}, duplicates={duplicate_count}")
+    logger.info("Total processed: inserted=%d, duplicates=%d", inserted_count, duplicate_count)
     session.close()
-    return {"inserted": inserted_count, "duplicates": duplicate_count}
\ No newline at end of file
+    result = {"inserted": inserted_count, "duplicates": duplicate_count}
+    if segments:
+        result["segments"] = segment_results(events, segments, inserted_ids)
+    return result
\ No newline at end of file
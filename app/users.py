@@ -0,0 +1,68 @@
+import base64
+import uuid
+from datetime import datetime
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models import Event
+
+TIMELINE_MAX_LIMIT = 1000
+
+users_router = APIRouter(tags=["users"])
+
+
+def encode_cursor(occurred_at, event_id):
+    payload = orjson.dumps([occurred_at.isoformat(), str(event_id)])
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        occurred_at, event_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(occurred_at), uuid.UUID(event_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid 'before' cursor")
+
+
+@users_router.get("/{user_id}/events")
+async def get_user_events(
+    user_id: str,
+    before: str = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, description=f"Events per page, at most {TIMELINE_MAX_LIMIT}"),
+    event_type: str = Query(None),
+    session: AsyncSession = Depends(get_db)
+):
+    if limit <= 0 or limit > TIMELINE_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Limit must be between 1 and {TIMELINE_MAX_LIMIT}")
+
+    # Newest first along ix_events_user_id_occurred_at; event_id breaks ties within one timestamp.
+    query = (
+        select(Event.event_id, Event.occurred_at, Event.event_type, Event.properties)
+        .where(Event.user_id == user_id)
+        .order_by(Event.occurred_at.desc(), Event.event_id.desc())
+        .limit(limit + 1)
+    )
+    if before:
+        query = query.where(tuple_(Event.occurred_at, Event.event_id) < decode_cursor(before))
+    if event_type:
+        query = query.where(Event.event_type == event_type)
+
+    rows = (await session.execute(query)).all()
+    page = rows[:limit]
+    return {
+        "user_id": user_id,
+        "events": [
+            {
+                "event_id": str(r.event_id),
+                "occurred_at": r.occurred_at.isoformat(),
+                "event_type": r.event_type,
+                "properties": r.properties,
+            }
+            for r in page
+        ],
+        "next_cursor": encode_cursor(page[-1].occurred_at, page[-1].event_id) if len(rows) > limit else None,
+    }
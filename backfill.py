@@ -0,0 +1,31 @@
+import sys
+import time
+
+from app.database import SessionLocal
+from app.ingest import backfill_first_seen, rebuild_property_sketches, rebuild_rollups, rebuild_sketches
+
+BACKFILLS = {
+    "first-seen": backfill_first_seen,
+    "rollups": rebuild_rollups,
+    "sketches": rebuild_sketches,
+    "top-values": rebuild_property_sketches,
+}
+
+
+def backfill(target):
+    start_time = time.time()
+    print(f"Start backfilling {target}")
+
+    with SessionLocal() as session:
+        rows = BACKFILLS[target](session)
+
+    elapsed = time.time() - start_time
+    print(f"Backfill finished in {elapsed:.2f}s")
+    print(f"Updated rows: {rows}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BACKFILLS:
+        print(f"Usage: python backfill.py <{'|'.join(BACKFILLS)}>")
+        sys.exit(1)
+    backfill(sys.argv[1])
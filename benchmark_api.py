@@ -1,51 +1,248 @@
-import httpx
-import uuid
+import argparse
+import asyncio
+import json
 import random
-from datetime import datetime, timedelta
+import sys
 import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+import httpx
 
-N = 10000
-events_url = "http://127.0.0.1:8000/events/"
-analytics_url = "http://127.0.0.1:8000/stats"
+COUNTRIES = ["UA", "PL", "DE", "US", "GB"]
+EVENT_TYPES = [f"type_{i}" for i in range(1, 11)]
 
-events = []
-for i in range(N):
-    events.append({
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Load test for the events API against a running stack")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel POST /events/ clients")
+    parser.add_argument("--batch-size", type=int, default=1000, help="events per POST")
+    parser.add_argument("--stats-concurrency", type=int, default=2, help="parallel /stats clients")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=7, help="spread occurred_at over the last N days")
+    parser.add_argument("--dry-run", action="store_true", help="POST with dry_run=true, nothing is inserted")
+    parser.add_argument("--freshness-interval", type=float, default=2, help="seconds between freshness probes")
+    parser.add_argument("--freshness-timeout", type=float, default=60)
+    parser.add_argument("--api-key", default="benchmark", help="X-API-Key, i.e. the rate limit bucket")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    return parser.parse_args(argv)
+
+
+def make_events(count, users, days, now):
+    return [{
         "event_id": str(uuid.uuid4()),
-        "occurred_at": (datetime.utcnow() - timedelta(days=random.randint(0, 10))).isoformat(),
-        "user_id": f"user_{random.randint(1, 1000)}",
-        "event_type": f"type_{random.randint(1, 10)}",
-        "properties": {"key": "value"}
-    })
-
-
-with httpx.Client() as client:
-    # post
-    start_time = time.time()
-    for i in range(0, N, 1000):
-        batch = events[i:i+1000]
-        r = client.post(events_url, params={"dry_run": "true"}, json=batch)
-        r.raise_for_status()
-    end_time = time.time()
-    post_time = end_time - start_time
-    print(f"Sent {N} events in {post_time:.2f}s, speed={N/post_time:.0f} events/sec")
-
-    # get
-    from_date = (datetime.utcnow() - timedelta(days=7)).date().isoformat()
-    to_date = datetime.utcnow().date().isoformat()
-
-    r = client.get(f"{analytics_url}/dau", params={"from_date": from_date, "to_date": to_date})
-    r.raise_for_status()
-    dau_result = r.json()
-    print("DAU:", dau_result)
-
-    r = client.get(f"{analytics_url}/top-events", params={"from_date": from_date, "to_date": to_date, "limit": 5})
-    r.raise_for_status()
-    top_events_result = r.json()
-    print("Top events:", top_events_result)
-
-    start_date = (datetime.utcnow() - timedelta(days=7)).date().isoformat()
-    r = client.get(f"{analytics_url}/retention", params={"start_date": start_date, "windows": 7})
-    r.raise_for_status()
-    retention_result = r.json()
-    print("Retention:", retention_result)
\ No newline at end of file
+        "occurred_at": (now - timedelta(seconds=random.uniform(0, days * 86400))).isoformat(),
+        "user_id": f"user_{random.randint(1, users)}",
+        "event_type": random.choice(EVENT_TYPES),
+        "properties": {"country": random.choice(COUNTRIES)},
+    } for _ in range(count)]
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def summarize(latencies, elapsed):
+    return {
+        "count": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "max_ms": _ms(max(latencies, default=None)),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+class LoadTest:
+
+    def __init__(self, args):
+        self.args = args
+        self.deadline = None
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.events_sent = 0
+        self.freshness = []
+        self.freshness_timeouts = 0
+
+    def running(self):
+        return time.perf_counter() < self.deadline
+
+    async def request(self, client, name, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.statuses[name][str(status)] += 1
+        if response is not None and response.is_success:
+            self.latencies[name].append(time.perf_counter() - start)
+        return response
+
+    async def ingest_worker(self, client):
+        params = {"dry_run": "true"} if self.args.dry_run else None
+        while self.running():
+            events = make_events(self.args.batch_size, self.args.users, self.args.days, datetime.now(timezone.utc))
+            response = await self.request(
+                client, "POST /events/", "POST", "/events/",
+                content=json.dumps(events), params=params, headers={"Content-Type": "application/json"},
+            )
+            if response is not None and response.is_success:
+                self.events_sent += len(events)
+            elif response is not None and response.status_code == 429:
+                await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+
+    def stats_queries(self):
+        today = datetime.now(timezone.utc).date()
+        from_date, to_date = (today - timedelta(days=self.args.days)).isoformat(), today.isoformat()
+        return [
+            ("/stats/dau", {"from_date": from_date, "to_date": to_date}),
+            ("/stats/dau", {"from_date": from_date, "to_date": to_date, "approx": "true"}),
+            ("/stats/active-users", {"from_date": from_date, "to_date": to_date}),
+            ("/stats/top-events", {"from_date": from_date, "to_date": to_date, "limit": 5}),
+            ("/stats/retention", {"start_date": from_date, "windows": self.args.days}),
+            ("/stats/retention-matrix", {"from_date": from_date, "to_date": to_date, "windows": 3}),
+            ("/stats/funnel", {"steps": "type_1,type_2,type_3", "from_date": from_date, "to_date": to_date}),
+        ]
+
+    async def stats_worker(self, client):
+        queries = self.stats_queries()
+        while self.running():
+            path, params = random.choice(queries)
+            name = f"GET {path}" + (" approx" if params.get("approx") else "")
+            response = await self.request(client, name, "GET", path, params=params)
+            if response is not None and response.status_code == 429:
+                await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+
+    async def freshness_probe(self, client):
+        # A unique country makes the probe the only user in its /stats/dau slice.
+        now = datetime.now(timezone.utc)
+        day = now.date().isoformat()
+        country = f"bench-{uuid.uuid4().hex[:8]}"
+        event = make_events(1, 1, 0, now)[0]
+        event["properties"] = {"country": country}
+        params = {"from_date": day, "to_date": day, "country": country}
+
+        headers = {"X-API-Key": f"{self.args.api_key}-freshness"}
+
+        start = time.perf_counter()
+        response = await self.request(
+            client, "freshness POST", "POST", "/events/", json=[event], headers=headers)
+        if response is None or not response.is_success:
+            return
+        while time.perf_counter() - start < self.args.freshness_timeout:
+            response = await self.request(
+                client, "freshness GET", "GET", "/stats/dau", params=params, headers=headers)
+            if response is not None and response.is_success and response.json():
+                self.freshness.append(time.perf_counter() - start)
+                return
+            await asyncio.sleep(0.1)
+        self.freshness_timeouts += 1
+
+    async def freshness_worker(self, client):
+        while self.running():
+            await self.freshness_probe(client)
+            await asyncio.sleep(self.args.freshness_interval)
+
+    async def run(self):
+        args = self.args
+        connections = args.concurrency + args.stats_concurrency + 1
+        async with httpx.AsyncClient(
+            base_url=args.url,
+            headers={"X-API-Key": args.api_key},
+            limits=httpx.Limits(max_connections=connections),
+            timeout=args.freshness_timeout,
+        ) as client:
+            start = time.perf_counter()
+            self.deadline = start + args.duration
+            workers = [self.ingest_worker(client) for _ in range(args.concurrency)]
+            workers += [self.stats_worker(client) for _ in range(args.stats_concurrency)]
+            if not args.dry_run:
+                workers.append(self.freshness_worker(client))
+            await asyncio.gather(*workers)
+            elapsed = time.perf_counter() - start
+
+        return {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "tolerance")},
+            "elapsed_s": round(elapsed, 2),
+            "ingest": {"events": self.events_sent, "events_per_sec": round(self.events_sent / elapsed, 1)},
+            "endpoints": {
+                name: {**summarize(self.latencies[name], elapsed), "statuses": dict(self.statuses[name])}
+                for name in sorted(self.statuses)
+            },
+            "freshness": {
+                "samples": len(self.freshness),
+                "timeouts": self.freshness_timeouts,
+                "p50_ms": _ms(percentile(self.freshness, 50)),
+                "p95_ms": _ms(percentile(self.freshness, 95)),
+                "max_ms": _ms(max(self.freshness, default=None)),
+            },
+        }
+
+
+def compare(results, baseline, tolerance):
+    checks = [("ingest events_per_sec", results["ingest"]["events_per_sec"],
+               baseline["ingest"]["events_per_sec"], False)]
+    for name, current in results["endpoints"].items():
+        previous = baseline["endpoints"].get(name)
+        if previous and not name.startswith("freshness"):
+            checks += [(f"{name} {key}", current[key], previous[key], True) for key in ("p95_ms", "p99_ms")]
+    checks.append(("freshness p95_ms", results["freshness"]["p95_ms"], baseline["freshness"]["p95_ms"], True))
+
+    regressions = []
+    for name, current, previous, lower_is_better in checks:
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        regressed = change > tolerance if lower_is_better else change < -tolerance
+        print(f"{'REGRESSION' if regressed else 'ok':10} {name:45} {previous:>10} -> {current:>10} ({change:+.0%})")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def report(results):
+    print(f"Ingested {results['ingest']['events']} events in {results['elapsed_s']}s, "
+          f"speed={results['ingest']['events_per_sec']:.0f} events/sec")
+    print(f"{'endpoint':40} {'count':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}  statuses")
+    for name, s in results["endpoints"].items():
+        print(f"{name:40} {s['count']:>7} {s['rps']:>8} {s['p50_ms'] or '-':>8} {s['p95_ms'] or '-':>8} "
+              f"{s['p99_ms'] or '-':>8}  {s['statuses']}")
+    f = results["freshness"]
+    print(f"Freshness (POST until visible in /stats/dau): samples={f['samples']}, timeouts={f['timeouts']}, "
+          f"p50={f['p50_ms']}ms, p95={f['p95_ms']}ms, max={f['max_ms']}ms")
+
+
+def main(argv):
+    args = parse_args(argv)
+    results = asyncio.run(LoadTest(args).run())
+    report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
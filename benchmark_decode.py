@@ -0,0 +1,43 @@
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from pydantic import TypeAdapter
+
+from app.fast_ingest import decode_events
+from app.schemas import EventSchema
+
+N = 10000
+ROUNDS = 5
+
+events = []
+for i in range(N):
+    events.append({
+        "event_id": str(uuid.uuid4()),
+        "occurred_at": (datetime.utcnow() - timedelta(days=random.randint(0, 10))).isoformat(),
+        "user_id": f"user_{random.randint(1, 1000)}",
+        "event_type": f"type_{random.randint(1, 10)}",
+        "properties": {"country": random.choice(["UA", "PL", "DE"]), "session_id": uuid.uuid4().hex[:8]}
+    })
+body = json.dumps(events).encode()
+
+pydantic_adapter = TypeAdapter(list[EventSchema])
+
+
+def pydantic_path():
+    parsed = pydantic_adapter.validate_json(body)
+    return json.dumps([e.dict() for e in parsed], default=str)
+
+
+def fast_path():
+    parsed, errors = decode_events(body)
+    return json.dumps(parsed)
+
+
+for name, decode in [("pydantic + .dict()", pydantic_path), ("fast decode", fast_path)]:
+    start_time = time.time()
+    for _ in range(ROUNDS):
+        decode()
+    elapsed = time.time() - start_time
+    print(f"{name}: {N * ROUNDS} events in {elapsed:.2f}s, speed={N * ROUNDS / elapsed:.0f} events/sec")
@@ -0,0 +1,29 @@
+import asyncio
+import time
+import uuid
+
+from app.ratelimit import RateLimit, TokenBucketLimiter
+
+N = 20000
+limit = RateLimit("benchmark", capacity=N * 2, per_second=N)
+
+
+async def run(local_batch):
+    limiter = TokenBucketLimiter(local_batch=local_batch)
+    client = f"bench:{uuid.uuid4()}"
+    await limiter.acquire(limit, client)
+
+    start_time = time.perf_counter()
+    for _ in range(N):
+        await limiter.acquire(limit, client)
+    elapsed = time.perf_counter() - start_time
+    print(f"local_batch={local_batch}: {N} checks in {elapsed:.2f}s, "
+          f"overhead={elapsed / N * 1e6:.1f}us/request")
+
+
+async def main():
+    for local_batch in (1, 5, 20):
+        await run(local_batch)
+
+
+asyncio.run(main())
@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event, func, select
+
+import app.cache
+from app import analytics
+from app.database import AsyncSessionLocal, async_engine
+from app.models import DailyUserActivity
+
+EXPLAIN = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="EXPLAIN (ANALYZE, BUFFERS) every query behind /stats endpoints")
+    parser.add_argument("--from-date", help="defaults to the first day in daily_user_activity")
+    parser.add_argument("--to-date", help="defaults to the last day in daily_user_activity")
+    parser.add_argument("--country", default="UA")
+    parser.add_argument("--plans", action="store_true", help="print the full text of every plan")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown / buffer growth")
+    return parser.parse_args(argv)
+
+
+def scenarios(from_dt, to_dt, country):
+    from_date, to_date = from_dt.isoformat(), to_dt.isoformat()
+    week_end = min(from_dt + timedelta(days=6), to_dt).isoformat()
+    return [
+        ("dau", analytics.get_dau, dict(from_date=from_date, to_date=to_date, country=None, approx=False, props={})),
+        ("dau country", analytics.get_dau,
+         dict(from_date=from_date, to_date=to_date, country=country, approx=False, props={})),
+        ("dau approx", analytics.get_dau,
+         dict(from_date=from_date, to_date=to_date, country=None, approx=True, props={})),
+        ("dau prop", analytics.get_dau,
+         dict(from_date=from_date, to_date=to_date, country=None, approx=False, props={"currency": "USD"})),
+        ("active-users", analytics.get_active_users,
+         dict(from_date=from_date, to_date=to_date, country=None, approx=False, props={})),
+        ("active-users country", analytics.get_active_users,
+         dict(from_date=from_date, to_date=to_date, country=country, approx=False, props={})),
+        ("top-events", analytics.get_top_events, dict(from_date=from_date, to_date=to_date, limit=10, props={})),
+        ("top-events country", analytics.get_top_events,
+         dict(from_date=from_date, to_date=to_date, limit=10, props={"country": country})),
+        ("funnel", analytics.get_funnel, dict(
+            steps="app_open,view_item,add_to_cart,purchase", from_date=from_date, to_date=week_end, within="1d", props={}
+        )),
+        ("top-values", analytics.get_top_values, dict(
+            property="item_id", from_date=from_date, to_date=to_date, limit=10, exact=False, props={}
+        )),
+        ("top-values exact", analytics.get_top_values, dict(
+            property="item_id", from_date=from_date, to_date=to_date, limit=10, exact=True, props={}
+        )),
+        ("retention", analytics.get_retention, dict(start_date=from_date, windows=7, props={})),
+        ("retention-matrix", analytics.get_retention_matrix,
+         dict(from_date=from_date, to_date=week_end, windows=7, props={})),
+    ]
+
+
+def walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk(child)
+
+
+def summarize_plan(explained):
+    root = explained["Plan"]
+    nodes = list(walk(root))
+    return {
+        "execution_ms": explained["Execution Time"],
+        "planning_ms": explained["Planning Time"],
+        "shared_hit": root.get("Shared Hit Blocks", 0),
+        "shared_read": root.get("Shared Read Blocks", 0),
+        "temp_written": root.get("Temp Written Blocks", 0),
+        "rows": root.get("Actual Rows"),
+        "seq_scans": sorted({n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan"}),
+        "index_scans": sorted({n["Index Name"] for n in nodes if "Index Name" in n}),
+    }
+
+
+def format_plan(node, depth=0):
+    line = f"{'  ' * depth}-> {node['Node Type']}"
+    if "Relation Name" in node:
+        line += f" on {node['Relation Name']}"
+    if "Index Name" in node:
+        line += f" using {node['Index Name']}"
+    line += f" (rows={node.get('Actual Rows')} time={node.get('Actual Total Time')}ms)"
+    return "\n".join([line] + [format_plan(child, depth + 1) for child in node.get("Plans", [])])
+
+
+async def explain_scenario(handler, kwargs):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith(EXPLAIN):
+            statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with AsyncSessionLocal() as session:
+            start = time.perf_counter()
+            await handler(**kwargs, session=session)
+            elapsed = time.perf_counter() - start
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+
+    queries = []
+    async with AsyncSessionLocal() as session:
+        connection = await session.connection()
+        for statement, parameters in statements:
+            result = await connection.exec_driver_sql(EXPLAIN + statement, parameters)
+            explained = result.scalar()
+            if isinstance(explained, str):
+                explained = json.loads(explained)
+            queries.append({"sql": statement, **summarize_plan(explained[0]), "plan": explained[0]["Plan"]})
+    return {"handler_ms": round(elapsed * 1000, 2), "queries": queries}
+
+
+async def data_range():
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(select(func.min(DailyUserActivity.day), func.max(DailyUserActivity.day)))).one()
+
+
+async def run(args):
+    # Every call must reach the database, not the analytics cache.
+    app.cache.CACHE_ENABLED = False
+
+    first_day, last_day = await data_range()
+    from_dt = date.fromisoformat(args.from_date) if args.from_date else first_day
+    to_dt = date.fromisoformat(args.to_date) if args.to_date else last_day
+    if from_dt is None or to_dt is None:
+        print("No data in daily_user_activity; load a dataset first (python generate_dataset.py --load)")
+        sys.exit(1)
+
+    results = {"from_date": from_dt.isoformat(), "to_date": to_dt.isoformat(), "scenarios": {}}
+    for name, handler, kwargs in scenarios(from_dt, to_dt, args.country):
+        results["scenarios"][name] = await explain_scenario(handler, kwargs)
+    await async_engine.dispose()
+    return results
+
+
+def report(results, show_plans):
+    print(f"Range: {results['from_date']} .. {results['to_date']}")
+    print(f"{'scenario':24} {'#':>2} {'exec ms':>10} {'plan ms':>8} {'hit':>9} {'read':>9} {'rows':>8}  seq scans")
+    for name, scenario in results["scenarios"].items():
+        for i, q in enumerate(scenario["queries"]):
+            print(f"{name:24} {i:>2} {q['execution_ms']:>10.2f} {q['planning_ms']:>8.2f} {q['shared_hit']:>9} "
+                  f"{q['shared_read']:>9} {q['rows']:>8}  {', '.join(q['seq_scans']) or '-'}")
+            if show_plans:
+                print(q["sql"])
+                print(format_plan(q["plan"]))
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, scenario in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if not previous or len(previous["queries"]) != len(scenario["queries"]):
+            print(f"{'new':10} {name}: query set changed, nothing to compare")
+            continue
+        for i, (current, before) in enumerate(zip(scenario["queries"], previous["queries"])):
+            label = f"{name} #{i}"
+            new_seq_scans = set(current["seq_scans"]) - set(before["seq_scans"])
+            problems = [f"new seq scan on {relation}" for relation in sorted(new_seq_scans)]
+            buffers = current["shared_hit"] + current["shared_read"]
+            buffers_before = before["shared_hit"] + before["shared_read"]
+            if buffers_before and buffers > buffers_before * (1 + tolerance):
+                problems.append(f"buffers {buffers_before} -> {buffers}")
+            if before["execution_ms"] and current["execution_ms"] > before["execution_ms"] * (1 + tolerance):
+                problems.append(f"execution {before['execution_ms']:.2f}ms -> {current['execution_ms']:.2f}ms")
+
+            print(f"{'REGRESSION' if problems else 'ok':10} {label:28} {'; '.join(problems)}")
+            if problems:
+                regressions.append(label)
+    return regressions
+
+
+def main(argv):
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    report(results, args.plans)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} plan regression(s)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
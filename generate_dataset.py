@@ -0,0 +1,156 @@
+import argparse
+import bisect
+import csv
+import gzip
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+# Shares and property shapes follow data/events_sample.csv.
+SAMPLE_EVENT_TYPES = [
+    ("app_open", 0.305),
+    ("view_item", 0.246),
+    ("message_sent", 0.178),
+    ("add_to_cart", 0.118),
+    ("login", 0.057),
+    ("purchase", 0.053),
+    ("logout", 0.043),
+]
+COUNTRIES = ["IT", "NL", "KZ", "PL", "GB", "ES", "SE", "FR", "RO", "US", "DE", "UA"]
+COUNTRY_WEIGHTS = [9, 9, 9, 9, 8, 8, 8, 8, 8, 8, 8, 8]
+HEADER = ["event_id", "occurred_at", "user_id", "event_type", "properties_json"]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic events dataset")
+    parser.add_argument("--events", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--start", default="2025-01-01", help="first day of the dataset")
+    parser.add_argument("--event-types", type=int, default=len(SAMPLE_EVENT_TYPES),
+                        help="sample types first, extra ones are named custom_<n>")
+    parser.add_argument("--properties", choices=["sample", "minimal"], default="sample",
+                        help="sample: per-type shapes as in the sample CSV; minimal: country and session_id only")
+    parser.add_argument("--extra-properties", type=int, default=0, help="add N extra string properties per event")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of events per user")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="share of rows repeating an event_id")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--files", type=int, default=os.cpu_count(), help="output shards, imported in parallel")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--out", default="data/generated")
+    parser.add_argument("--load", action="store_true", help="import the files with import_events.py --fast")
+    parser.add_argument("--workers", type=int, help="import/generation processes")
+    return parser.parse_args(argv)
+
+
+def event_types(count):
+    types = SAMPLE_EVENT_TYPES[:count]
+    # Extra types get a long tail below the rarest sample type.
+    types += [(f"custom_{i}", 0.04 / i) for i in range(1, count - len(types) + 1)]
+    return [name for name, _ in types], list(itertools.accumulate(weight for _, weight in types))
+
+
+def user_profiles(args):
+    rng = random.Random(f"{args.seed}:users")
+    # user "1" is the most active one, like in the sample.
+    activity = list(itertools.accumulate(1 / rank ** args.skew for rank in range(1, args.users + 1)))
+    signup = [min(int(rng.expovariate(3 / args.days)), args.days - 1) for _ in range(args.users)]
+    country = rng.choices(COUNTRIES, COUNTRY_WEIGHTS, k=args.users)
+    return activity, signup, country
+
+
+def sample_properties(rng, event_type):
+    if event_type == "view_item":
+        return {"item_id": f"SKU{rng.randint(1000, 9999)}", "price": round(rng.uniform(5, 300), 2), "currency": "USD"}
+    if event_type == "add_to_cart":
+        return {"item_id": f"SKU{rng.randint(1000, 9999)}", "qty": rng.randint(1, 5)}
+    if event_type == "purchase":
+        return {
+            "order_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "amount": round(rng.uniform(10, 500), 2),
+            "currency": "USD",
+            "payment_method": rng.choice(["card", "paypal", "apple_pay"]),
+            "items": rng.randint(1, 5),
+        }
+    if event_type in ("login", "logout"):
+        return {"method": rng.choice(["password", "google", "apple"])}
+    if event_type == "app_open":
+        return {"app_version": f"1.{rng.randint(5, 9)}.{rng.randint(0, 9)}", "os": rng.choice(["iOS", "Android"])}
+    if event_type == "message_sent":
+        return {"length": int(rng.paretovariate(1.5) * 20), "channel": rng.choice(["direct", "group", "channel"])}
+    return {"value": rng.randint(1, 100)}
+
+
+def generate_file(args, shard, count, path):
+    rng = random.Random(f"{args.seed}:{shard}")
+    activity, signup, country = user_profiles(args)
+    total_activity = activity[-1]
+    names, type_weights = event_types(args.event_types)
+    start = datetime.combine(date.fromisoformat(args.start), datetime.min.time(), timezone.utc)
+    recent = []
+
+    opener = gzip.open if args.gzip else open
+    with opener(path, "wt", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for _ in range(count):
+            if recent and rng.random() < args.duplicate_rate:
+                writer.writerow(rng.choice(recent))
+                continue
+
+            user = bisect.bisect_left(activity, rng.random() * total_activity)
+            day = rng.randint(signup[user], args.days - 1)
+            event_type = names[bisect.bisect_left(type_weights, rng.random() * type_weights[-1])]
+            session = zlib.crc32(f"{user}:{day}:{rng.randint(0, 2)}".encode())
+
+            properties = {"country": country[user], "session_id": f"{session:08x}"}
+            if args.properties == "sample":
+                properties.update(sample_properties(rng, event_type))
+            for i in range(args.extra_properties):
+                properties[f"prop_{i}"] = f"v{rng.randint(0, 99)}"
+
+            row = [
+                str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                (start + timedelta(days=day, seconds=rng.randrange(86400))).isoformat(),
+                str(user + 1),
+                event_type,
+                json.dumps(properties, separators=(",", ":")),
+            ]
+            writer.writerow(row)
+            if args.duplicate_rate:
+                recent.append(row)
+                if len(recent) > 1000:
+                    recent.pop(0)
+    return path
+
+
+def generate(args):
+    start_time = time.time()
+    os.makedirs(args.out, exist_ok=True)
+    files = max(1, min(args.files, args.events))
+    counts = [args.events // files + (1 if i < args.events % files else 0) for i in range(files)]
+    suffix = ".csv.gz" if args.gzip else ".csv"
+    paths = [os.path.join(args.out, f"events_{i:03d}{suffix}") for i in range(files)]
+
+    print(f"Generating {args.events} events for {args.users} users over {args.days} days into {files} file(s)")
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(generate_file, itertools.repeat(args), range(files), counts, paths))
+
+    elapsed = time.time() - start_time
+    print(f"Generated in {elapsed:.2f}s, speed: {args.events/elapsed:.0f} rows/sec")
+    return paths
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    paths = generate(args)
+    if args.load:
+        from import_events import import_events_fast
+        import_events_fast(paths, args.workers)
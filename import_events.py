@@ -1,21 +1,31 @@
 import csv
+import gzip
+import io
 import json
+import os
+import re
 import sys
 import time
 import uuid
-from datetime import datetime
-from sqlalchemy.dialects.postgresql import insert
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy import text
 
-from app.database import SessionLocal
-from app.models import Event
+from app.database import SessionLocal, engine
+from app.ingest import insert_events_batch, insert_from_staging, utc_naive
 
 BATCH_SIZE = 1000
+COPY_BATCH_SIZE = 50000
+CHUNK_BYTES = 64 * 1024 * 1024
+STAGING_TABLE = "events_staging"
+# A physical line with an odd number of quotes opens or closes a quoted field that spans lines.
+ODD_QUOTES_LINE = re.compile(rb'^[^"\n]*"[^"\n]*(?:"[^"\n]*"[^"\n]*)*$', re.M)
 
 def validate_row(row):
 
     try:
         event_id = str(uuid.UUID(row['event_id']))
-        occurred_at = datetime.fromisoformat(row['occurred_at'])
+        # Naive UTC, so the COPY into the timestamp staging column keeps the same instant as the ORM path.
+        occurred_at = utc_naive(row['occurred_at'])
         user_id = row['user_id']
         event_type = row['event_type']
         if not user_id or not event_type:
@@ -31,6 +41,12 @@ def validate_row(row):
     except (ValueError, json.JSONDecodeError) as e:
         raise ValueError(f"Validation error: {e}")
 
+def open_csv(csv_path):
+    if csv_path.endswith('.gz'):
+        return gzip.open(csv_path, 'rt', newline='', encoding='utf-8')
+    return open(csv_path, newline='', encoding='utf-8')
+
+
 def import_events(csv_path, batch_key=None):
     start_time = time.time()
     print(f"Start importing events from {csv_path}")
@@ -42,7 +58,7 @@ def import_events(csv_path, batch_key=None):
     skipped = 0
     batch = []
 
-    with SessionLocal() as session, open(csv_path, newline='', encoding='utf-8') as csvfile:
+    with SessionLocal() as session, open_csv(csv_path) as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
             processed += 1
@@ -59,28 +75,24 @@ def import_events(csv_path, batch_key=None):
 
             if len(batch) >= BATCH_SIZE:
                 batch_start = time.time()
-                stmt = insert(Event).values(batch).on_conflict_do_nothing(index_elements=['event_id'])
-                result = session.execute(stmt)
-                session.commit()
+                rowcount = insert_events_batch(session, batch)
                 batch_elapsed = time.time() - batch_start
 
-                inserted += result.rowcount
-                skipped += len(batch) - result.rowcount
-                print(f"Batch inserted: {result.rowcount}, skipped: {len(batch) - result.rowcount}, "
+                inserted += rowcount
+                skipped += len(batch) - rowcount
+                print(f"Batch inserted: {rowcount}, skipped: {len(batch) - rowcount}, "
                       f"time: {batch_elapsed:.2f}s, speed: {len(batch)/batch_elapsed:.0f} rows/sec")
                 batch.clear()
 
 
         if batch:
             batch_start = time.time()
-            stmt = insert(Event).values(batch).on_conflict_do_nothing(index_elements=['event_id'])
-            result = session.execute(stmt)
-            session.commit()
+            rowcount = insert_events_batch(session, batch)
             batch_elapsed = time.time() - batch_start
 
-            inserted += result.rowcount
-            skipped += len(batch) - result.rowcount
-            print(f"Final batch inserted: {result.rowcount}, skipped: {len(batch) - result.rowcount}, "
+            inserted += rowcount
+            skipped += len(batch) - rowcount
+            print(f"Final batch inserted: {rowcount}, skipped: {len(batch) - rowcount}, "
                   f"time: {batch_elapsed:.2f}s, speed: {len(batch)/batch_elapsed:.0f} rows/sec")
 
     end_time = time.time()
@@ -91,10 +103,165 @@ def import_events(csv_path, batch_key=None):
     print(f"Skipped rows (invalid or duplicates): {skipped}")
 
 
+def has_multiline_records(csv_path, block_bytes=CHUNK_BYTES):
+    with open(csv_path, 'rb') as f:
+        tail = b''
+        while block := f.read(block_bytes):
+            data = tail + block
+            cut = data.rfind(b'\n') + 1
+            if ODD_QUOTES_LINE.search(data, 0, cut):
+                return True
+            tail = data[cut:]
+    return ODD_QUOTES_LINE.search(tail) is not None
+
+
+def split_chunks(csv_paths, chunk_bytes=CHUNK_BYTES):
+    """Byte ranges cut at line breaks, so they need one record per line; other files stay one chunk."""
+    chunks = []
+    for csv_path in csv_paths:
+        size = os.path.getsize(csv_path)
+        if csv_path.endswith('.gz') or size <= chunk_bytes:
+            chunks.append((csv_path, 0, None))
+            continue
+        if has_multiline_records(csv_path):
+            print(f"{csv_path} has quoted fields spanning lines, importing it as one chunk")
+            chunks.append((csv_path, 0, None))
+            continue
+        for start in range(0, size, chunk_bytes):
+            chunks.append((csv_path, start, min(start + chunk_bytes, size)))
+    return chunks
+
+
+def read_chunk(csv_path, start, end):
+    if end is None:
+        with open_csv(csv_path) as csvfile:
+            yield from csv.DictReader(csvfile)
+        return
+
+    with open(csv_path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8')]))
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()
+        lines = []
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            lines.append(line.decode('utf-8'))
+            if len(lines) >= COPY_BATCH_SIZE:
+                yield from csv.DictReader(lines, fieldnames=header)
+                lines = []
+        yield from csv.DictReader(lines, fieldnames=header)
+
+
+def copy_batch(session, buffer):
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    cursor.copy_expert(
+        f"COPY {STAGING_TABLE} (event_id, occurred_at, user_id, event_type, properties) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+    return insert_from_staging(session, STAGING_TABLE)
+
+
+def import_chunk(chunk):
+    csv_path, start, end = chunk
+    engine.dispose(close=False)
+    chunk_start = time.time()
+
+    processed = 0
+    inserted = 0
+    rejected = 0
+    queued = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    with SessionLocal() as session:
+        session.execute(text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} "
+            f"(event_id uuid, occurred_at timestamp, user_id text, event_type text, properties jsonb) "
+            f"ON COMMIT DELETE ROWS"
+        ))
+        session.commit()
+
+        for row in read_chunk(csv_path, start, end):
+            processed += 1
+            try:
+                validated = validate_row(row)
+            except ValueError as e:
+                print(f"Skipping row {processed} of {csv_path}@{start}: {e}")
+                rejected += 1
+                continue
+
+            properties = validated['properties']
+            writer.writerow([
+                validated['event_id'],
+                validated['occurred_at'].isoformat(),
+                validated['user_id'],
+                validated['event_type'],
+                json.dumps(properties) if properties is not None else None,
+            ])
+            queued += 1
+
+            if queued >= COPY_BATCH_SIZE:
+                inserted += copy_batch(session, buffer)
+                buffer.seek(0)
+                buffer.truncate()
+                queued = 0
+
+        if queued:
+            inserted += copy_batch(session, buffer)
+
+    elapsed = time.time() - chunk_start
+    print(f"Chunk {csv_path}@{start} inserted: {inserted}, rejected: {rejected}, "
+          f"time: {elapsed:.2f}s, speed: {processed/elapsed:.0f} rows/sec")
+    return processed, inserted, rejected
+
+
+def import_events_fast(csv_paths, workers=None):
+    start_time = time.time()
+    chunks = split_chunks(csv_paths)
+    print(f"Start fast import of {len(csv_paths)} file(s) in {len(chunks)} chunk(s)")
+
+    processed = 0
+    inserted = 0
+    rejected = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(import_chunk, chunk) for chunk in chunks]):
+            chunk_processed, chunk_inserted, chunk_rejected = future.result()
+            processed += chunk_processed
+            inserted += chunk_inserted
+            rejected += chunk_rejected
+
+    duplicates = processed - rejected - inserted
+    elapsed = time.time() - start_time
+    print(f"\nImport finished in {elapsed:.2f}s, speed: {processed/elapsed:.0f} rows/sec")
+    print(f"Processed rows: {processed}")
+    print(f"Inserted rows: {inserted}")
+    print(f"Skipped rows (invalid or duplicates): {rejected + duplicates}")
+    print(f"  invalid: {rejected}, duplicates: {duplicates}")
+
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    args = sys.argv[1:]
+    if args and args[0] == "--fast":
+        args = args[1:]
+        workers = None
+        if args[:1] == ["--workers"]:
+            workers = int(args[1])
+            args = args[2:]
+        if not args:
+            print("Usage: python import_events.py --fast [--workers N] <path-to-csv[.gz]> [...]")
+            sys.exit(1)
+        import_events_fast(args, workers)
+        sys.exit(0)
+
+    if len(args) < 1:
         print("Usage: python import_events.py <path-to-csv> [batch-key]")
+        print("       python import_events.py --fast [--workers N] <path-to-csv[.gz]> [...]")
         sys.exit(1)
-    csv_file = sys.argv[1]
-    batch_key = sys.argv[2] if len(sys.argv) > 2 else None
+    csv_file = args[0]
+    batch_key = args[1] if len(args) > 1 else None
     import_events(csv_file, batch_key)
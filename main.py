@@ -1,34 +1,68 @@
-from fastapi import FastAPI, Request, HTTPException
-from app.api import events_router
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
+from app.api import count_rejected, events_router
 from app.analytics import analytics_router
+from app.batcher import event_batcher
+from app.database import AsyncSessionLocal, async_engine
+from app.hot_window import hot_window
+from app.metrics import EVENTS_RECEIVED, EVENTS_REJECTED, HTTP_REQUEST_SECONDS, render_metrics
+from app.ratelimit import client_key, limit_for_path, rate_limiter
+from app.users import users_router
 import time
 
-app = FastAPI()
 
-RATE_LIMIT = 100
-tokens = RATE_LIMIT
-last_check = time.time()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    hot_window.start(AsyncSessionLocal)
+    yield
+    await hot_window.close()
+    await event_batcher.close()
+    await async_engine.dispose()
 
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    global tokens, last_check
-    now = time.time()
 
-    tokens += (now - last_check)
-    tokens = min(tokens, RATE_LIMIT)
-    last_check = now
+app = FastAPI(lifespan=lifespan)
 
-    if tokens < 1:
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+@app.middleware("http")
+async def add_process_time_header(request: Request, call_next):
+    limit = limit_for_path(request.url.path)
+    decision = await rate_limiter.acquire(limit, client_key(request)) if limit else None
+    if decision is not None and not decision.allowed:
+        return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"}, headers=decision.headers())
 
-    tokens -= 1
     start_time = time.time()
     response = await call_next(request)
-    response.headers["X-Process-Time"] = str(time.time() - start_time)
+    elapsed = time.time() - start_time
+    response.headers["X-Process-Time"] = str(elapsed)
+    if decision is not None:
+        response.headers.update(decision.headers())
+
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.labels(
+        method=request.method, route=route.path if route else "unmatched", status=response.status_code
+    ).observe(elapsed)
     return response
 
+
+@app.exception_handler(RequestValidationError)
+async def count_rejected_events(request: Request, exc: RequestValidationError):
+    if request.url.path.startswith("/events"):
+        # Only body errors are about events; query-parameter errors (e.g. ?gzip=maybe) reject none.
+        rejected = count_rejected([e for e in exc.errors() if e["loc"][0] == "body" and len(e["loc"]) > 1])
+        EVENTS_RECEIVED.labels(endpoint="batch").inc(rejected)
+        EVENTS_REJECTED.labels(endpoint="batch").inc(rejected)
+    return await request_validation_exception_handler(request, exc)
+
 app.include_router(events_router, prefix="/events")
 app.include_router(analytics_router, prefix="/stats")
+app.include_router(users_router, prefix="/users")
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,35 @@
+import sys
+from datetime import date
+
+from app.database import SessionLocal
+from app.partitions import PARTITION_INTERVAL, create_partitions_ahead, detach_partitions_before
+
+USAGE = (
+    "Usage:\n"
+    "  python manage_partitions.py create-ahead <count>\n"
+    "  python manage_partitions.py detach <before-date> [--drop]"
+)
+
+
+def main(args):
+    if len(args) < 2:
+        print(USAGE)
+        sys.exit(1)
+
+    command = args[0]
+    with SessionLocal() as session:
+        if command == "create-ahead":
+            created = create_partitions_ahead(session, int(args[1]))
+            print(f"Partition interval: {PARTITION_INTERVAL}")
+            print(f"Created partitions: {', '.join(created) or 'none'}")
+        elif command == "detach":
+            drop = "--drop" in args[2:]
+            detached = detach_partitions_before(session, date.fromisoformat(args[1]), drop=drop)
+            print(f"{'Dropped' if drop else 'Detached'} partitions: {', '.join(detached) or 'none'}")
+        else:
+            print(USAGE)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
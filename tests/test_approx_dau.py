@@ -0,0 +1,38 @@
+import csv
+from app.hll import RELATIVE_ERROR
+from app.ingest import insert_events_batch
+from import_events import validate_row
+
+SAMPLE_CSV = "data/events_sample.csv"
+
+
+def load_sample(db_session):
+    with open(SAMPLE_CSV, newline='', encoding='utf-8') as csvfile:
+        rows = [validate_row(row) for row in csv.DictReader(csvfile)]
+    for i in range(0, len(rows), 1000):
+        insert_events_batch(db_session, rows[i:i + 1000])
+
+
+def assert_close(approx, exact):
+    assert abs(approx - exact) <= 3 * RELATIVE_ERROR * exact
+
+
+def test_approx_dau_matches_exact(client, db_session):
+    load_sample(db_session)
+    params = {"from_date": "2025-08-01", "to_date": "2025-08-31"}
+
+    exact = client.get("/stats/dau", params=params).json()
+    approx = client.get("/stats/dau", params={**params, "approx": "true"}).json()
+
+    assert [r["day"] for r in approx] == [r["day"] for r in exact]
+    for a, e in zip(approx, exact):
+        assert_close(a["dau"], e["dau"])
+
+    exact = client.get("/stats/dau", params={**params, "country": "UA"}).json()
+    approx = client.get("/stats/dau", params={**params, "country": "UA", "approx": "true"}).json()
+    for a, e in zip(approx, exact):
+        assert_close(a["dau"], e["dau"])
+
+    exact = client.get("/stats/active-users", params=params).json()
+    approx = client.get("/stats/active-users", params={**params, "approx": "true"}).json()
+    assert_close(approx["active_users"], exact["active_users"])
@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+from app import batcher
+from app.batcher import EventBatcher
+
+
+def test_concurrent_requests_are_coalesced(monkeypatch):
+    dispatched = []
+
+    def fake_delay(events, segments):
+        dispatched.append((list(events), segments))
+        return SimpleNamespace(id=f"task-{len(dispatched)}")
+
+    monkeypatch.setattr(batcher.insert_events_task, "delay", fake_delay)
+
+    async def run():
+        event_batcher = EventBatcher(max_events=10, max_delay_ms=20)
+        handles = await asyncio.gather(*[event_batcher.submit([i] * 3) for i in range(4)])
+        tail = await event_batcher.submit(["late"])
+        await event_batcher.close()
+        return handles, tail
+
+    handles, tail = asyncio.run(run())
+
+    assert handles == [("task-1", (0, 3)), ("task-1", (3, 3)), ("task-1", (6, 3)), ("task-1", (9, 3))]
+    assert tail == ("task-2", (0, 1))
+    assert [len(events) for events, _ in dispatched] == [12, 1]
+    assert dispatched[0][1] == [[0, 3], [3, 3], [6, 3], [9, 3]]
+
+
+def test_segment_results_split_the_batch_outcome():
+    import uuid
+    from app.tasks import segment_results
+
+    a, b, c = (uuid.uuid4() for _ in range(3))
+    events = [{"event_id": str(event_id)} for event_id in (a, b, a, c, b)]
+
+    results = segment_results(events, [[0, 2], [2, 3]], {a, c})
+
+    assert results == [
+        {"offset": 0, "length": 2, "inserted": 1, "duplicates": 1},
+        {"offset": 2, "length": 3, "inserted": 1, "duplicates": 2},
+    ]
@@ -0,0 +1,60 @@
+import asyncio
+from app.cache import AnalyticsCache
+
+
+def test_single_flight_and_version_invalidation(monkeypatch):
+    cache = AnalyticsCache(max_entries=10, redis_tier=False)
+    versions = {"token": "v1"}
+    calls = []
+
+    async def fake_versions(days):
+        return versions["token"]
+
+    monkeypatch.setattr(cache, "_versions", fake_versions)
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return [{"day": "2025-10-20", "dau": len(calls)}]
+
+    async def run():
+        first = await asyncio.gather(*[cache.get_or_compute(("dau", 1), [], compute) for _ in range(5)])
+        cached = await cache.get_or_compute(("dau", 1), [], compute)
+        versions["token"] = "v2"
+        refreshed = await cache.get_or_compute(("dau", 1), [], compute)
+        return first, cached, refreshed
+
+    first, cached, refreshed = asyncio.run(run())
+
+    assert all(result == [{"day": "2025-10-20", "dau": 1}] for result in first)
+    assert cached == first[0]
+    assert refreshed == [{"day": "2025-10-20", "dau": 2}]
+    assert cache.info()["misses"] == 2
+    assert cache.info()["coalesced"] == 4
+    assert cache.info()["hits"] == 1
+
+
+def test_cancelled_leader_does_not_strand_followers(monkeypatch):
+    cache = AnalyticsCache(max_entries=10, redis_tier=False)
+
+    async def fake_versions(days):
+        return "v1"
+
+    monkeypatch.setattr(cache, "_versions", fake_versions)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_compute(("dau", 1), [], compute))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(cache.get_or_compute(("dau", 1), [], compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.wait_for(asyncio.gather(*followers), 1)
+
+    assert asyncio.run(run()) == [2, 2, 2]
+    assert len(calls) == 2
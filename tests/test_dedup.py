@@ -0,0 +1,67 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import redis
+
+from app.dedup import EventDeduplicator
+
+
+class FakeSession:
+
+    def __init__(self, stored):
+        self.stored = stored
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        return SimpleNamespace(scalars=lambda: [uuid.UUID(event_id) for event_id in self.stored])
+
+
+def _event(event_id):
+    return {"event_id": event_id, "user_id": "u1", "event_type": "a"}
+
+
+def test_only_confirmed_duplicates_are_dropped(monkeypatch):
+    stored, unconfirmed, fresh = (str(uuid.uuid4()) for _ in range(3))
+    deduplicator = EventDeduplicator()
+
+    async def maybe_seen(event_ids):
+        return [event_id in (stored, unconfirmed) for event_id in event_ids]
+
+    monkeypatch.setattr(deduplicator, "maybe_seen", maybe_seen)
+    session = FakeSession([stored])
+
+    events, dropped = asyncio.run(deduplicator.drop_duplicates(
+        session, [_event(stored), _event(fresh), _event(fresh), _event(unconfirmed)]))
+
+    assert [e["event_id"] for e in events] == [fresh, unconfirmed]
+    assert dropped == 2
+    assert session.queries == 1
+
+
+def test_redis_failure_keeps_all_unique_events(monkeypatch):
+    deduplicator = EventDeduplicator()
+
+    async def maybe_seen(event_ids):
+        raise redis.ConnectionError("down")
+
+    monkeypatch.setattr(deduplicator, "maybe_seen", maybe_seen)
+    event_id = str(uuid.uuid4())
+    session = FakeSession([event_id])
+
+    events, dropped = asyncio.run(deduplicator.drop_duplicates(session, [_event(event_id), _event(event_id)]))
+
+    assert [e["event_id"] for e in events] == [event_id]
+    assert dropped == 1
+    assert session.queries == 0
+
+
+def test_bloom_positions_are_stable_and_in_range():
+    deduplicator = EventDeduplicator(bits=1024, hashes=5)
+    event_id = str(uuid.uuid4())
+
+    positions = deduplicator._positions(event_id)
+
+    assert positions == deduplicator._positions(event_id)
+    assert len(positions) == 5 and all(0 <= p < 1024 for p in positions)
@@ -0,0 +1,92 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import uuid
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from app import export
+from app.ingest import insert_events_batch
+from import_events import validate_row
+
+
+def _events():
+    return [
+        dict(event_id=str(uuid.uuid4()), occurred_at=datetime(2025, 12, 10, hour), user_id=f"x{hour}",
+             event_type="login" if hour % 2 else "purchase", properties={"country": "UA", "note": 'a,"b"'})
+        for hour in range(1, 5)
+    ]
+
+
+def test_export_csv_round_trips_through_import(client, db_session):
+    events = _events()
+    insert_events_batch(db_session, events)
+
+    resp = client.get("/events/export?from_date=2025-12-10&to_date=2025-12-10&format=csv")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert [validate_row(row) for row in rows] == events
+
+
+def test_export_ndjson_gzip_filters_event_type(client, db_session):
+    insert_events_batch(db_session, _events())
+
+    resp = client.get("/events/export?from_date=2025-12-10&to_date=2025-12-10&event_type=login&gzip=true")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/gzip"
+
+    lines = gzip.decompress(resp.content).decode().splitlines()
+    assert [json.loads(line)["user_id"] for line in lines] == ["x1", "x3"]
+
+    assert client.get("/events/export?from_date=2025-12-10&to_date=2025-12-10&format=xml").status_code == 400
+
+
+class FakeResult:
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def partitions(self):
+        for start in range(0, len(self.rows), 2):
+            yield self.rows[start:start + 2]
+
+    async def close(self):
+        pass
+
+
+class FakeSession:
+    """Serves the rows after the keyset bound it is given, two per chunk."""
+    rows = [
+        SimpleNamespace(occurred_at=datetime(2025, 12, 10, hour), event_id=uuid.UUID(int=hour)) for hour in range(5)
+    ]
+    opened = 0
+
+    async def __aenter__(self):
+        FakeSession.opened += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def stream(self, after):
+        return FakeResult([row for row in self.rows if after is None or (row.occurred_at, row.event_id) > after])
+
+
+def test_slow_client_reopens_cursor_without_losing_rows(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_CLIENT_WAIT_SECONDS", 0.01)
+    monkeypatch.setattr(export, "_export_query", lambda from_dt, to_dt, event_type, after: after)
+    FakeSession.opened = 0
+
+    async def consume():
+        seen = []
+        async for rows in export.export_chunks(FakeSession, date(2025, 12, 10), date(2025, 12, 10)):
+            await asyncio.sleep(0.05)
+            seen.extend(row.event_id.int for row in rows)
+        return seen
+
+    assert asyncio.run(consume()) == [0, 1, 2, 3, 4]
+    assert FakeSession.opened > 1
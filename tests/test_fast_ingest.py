@@ -0,0 +1,95 @@
+import json
+import uuid
+from app.fast_ingest import decode_events
+
+
+def make_event(**overrides):
+    event = {
+        "event_id": str(uuid.uuid4()),
+        "occurred_at": "2025-10-20T10:00:00",
+        "user_id": "u1",
+        "event_type": "login",
+    }
+    event.update(overrides)
+    return event
+
+
+def test_decode_valid_events():
+    payload = [make_event(), make_event(properties={"country": "UA"})]
+    events, errors = decode_events(json.dumps(payload).encode())
+
+    assert errors == []
+    assert events[0]["properties"] == {}
+    assert events[1]["properties"] == {"country": "UA"}
+    assert events[0]["occurred_at"] == "2025-10-20T10:00:00"
+
+
+def test_decode_reports_errors_per_index():
+    payload = [
+        make_event(),
+        make_event(event_id=str(uuid.uuid1())),
+        make_event(user_id=""),
+        make_event(occurred_at="yesterday", event_type=None),
+    ]
+    events, errors = decode_events(json.dumps(payload).encode())
+
+    assert events is None
+    assert [(e["loc"][1], e["loc"][2]) for e in errors] == [
+        (1, "event_id"),
+        (2, "user_id"),
+        (3, "occurred_at"),
+        (3, "event_type"),
+    ]
+
+
+def test_iter_ndjson_gzip_across_chunk_boundaries():
+    import asyncio
+    import gzip
+    from app.fast_ingest import iter_ndjson
+
+    lines = [json.dumps(make_event()) for _ in range(50)]
+    body = gzip.compress(("\n".join(lines) + "\n").encode())
+
+    async def chunks():
+        for i in range(0, len(body), 7):
+            yield body[i:i + 7]
+
+    async def collect():
+        return [(line_no, line) async for line_no, line in iter_ndjson(chunks(), gzipped=True)]
+
+    assert asyncio.run(collect()) == [(i, line.encode()) for i, line in enumerate(lines)]
+
+
+def test_iter_ndjson_reads_every_gzip_member():
+    import asyncio
+    import gzip
+    from app.fast_ingest import iter_ndjson
+
+    lines = [json.dumps(make_event()) for _ in range(6)]
+    body = b"".join(gzip.compress(("\n".join(lines[i:i + 2]) + "\n").encode()) for i in range(0, 6, 2))
+
+    async def chunks(size):
+        for i in range(0, len(body), size):
+            yield body[i:i + size]
+
+    async def collect(size):
+        return [line async for _, line in iter_ndjson(chunks(size), gzipped=True)]
+
+    for size in (5, 64, len(body)):
+        assert asyncio.run(collect(size)) == [line.encode() for line in lines]
+
+
+def test_occurred_at_matches_pydantic_path():
+    from app.api import event_payload
+    from app.schemas import EventSchema
+
+    inputs = ["2025-10-20T10:00:00+03:00", "2025-10-20T07:00:00Z", "2025-10-20", 1760943600, "1760943600"]
+    payload = [make_event(occurred_at=value) for value in inputs]
+    events, errors = decode_events(json.dumps(payload).encode())
+
+    assert errors == []
+    assert [e["occurred_at"] for e in events] == [event_payload(EventSchema(**e))["occurred_at"] for e in payload]
+    assert [e["occurred_at"] for e in events] == [
+        "2025-10-20T07:00:00", "2025-10-20T07:00:00", "2025-10-20T00:00:00", "2025-10-20T07:00:00",
+        "2025-10-20T07:00:00",
+    ]
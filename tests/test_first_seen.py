@@ -0,0 +1,26 @@
+from datetime import datetime, date
+import uuid
+from app.ingest import insert_events_batch
+from app.models import UserFirstSeen
+
+
+def make_event(user_id, occurred_at):
+    return {
+        "event_id": str(uuid.uuid4()),
+        "occurred_at": occurred_at,
+        "user_id": user_id,
+        "event_type": "login",
+        "properties": {},
+    }
+
+
+def test_first_seen_only_moves_backwards(db_session):
+    insert_events_batch(db_session, [make_event("u1", datetime(2025, 10, 20, 12))])
+    insert_events_batch(db_session, [
+        make_event("u1", datetime(2025, 10, 22, 9)),
+        make_event("u2", datetime(2025, 10, 22, 9)),
+    ])
+    insert_events_batch(db_session, [make_event("u1", "2025-10-18T08:00:00")])
+
+    rows = {r.user_id: r.first_seen for r in db_session.query(UserFirstSeen).all()}
+    assert rows == {"u1": date(2025, 10, 18), "u2": date(2025, 10, 22)}
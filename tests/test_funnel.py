@@ -0,0 +1,56 @@
+import uuid
+from datetime import datetime, timedelta
+
+from app.analytics import FunnelCounter
+from app.ingest import insert_events_batch
+
+T0 = datetime(2025, 12, 1, 10)
+
+
+def test_funnel_counter_is_ordered_and_windowed():
+    counter = FunnelCounter(["login", "view_item", "purchase"], timedelta(hours=1), datetime(2025, 12, 2))
+    events = [
+        ("u1", T0, "login"),
+        ("u1", T0 + timedelta(minutes=10), "view_item"),
+        ("u1", T0 + timedelta(minutes=30), "purchase"),
+        # purchase before view_item does not count
+        ("u2", T0, "login"),
+        ("u2", T0 + timedelta(minutes=1), "purchase"),
+        ("u2", T0 + timedelta(minutes=20), "view_item"),
+        # view_item outside the window
+        ("u3", T0, "login"),
+        ("u3", T0 + timedelta(hours=2), "view_item"),
+        # started after the range
+        ("u4", datetime(2025, 12, 2, 1), "login"),
+    ]
+    for event in events:
+        counter.add(*event)
+
+    assert counter.result() == [
+        {"event_type": "login", "users": 3, "conversion": 1.0, "median_seconds_from_previous": None},
+        {"event_type": "view_item", "users": 2, "conversion": 0.6667, "median_seconds_from_previous": 900.0},
+        {"event_type": "purchase", "users": 1, "conversion": 0.3333, "median_seconds_from_previous": 1200.0},
+    ]
+
+
+def test_funnel_endpoint(client, db_session):
+    insert_events_batch(db_session, [
+        dict(event_id=str(uuid.uuid4()), occurred_at=T0 + timedelta(minutes=i), user_id=user_id,
+             event_type=event_type, properties={"country": "UA"})
+        for i, (user_id, event_type) in enumerate([
+            ("f1", "login"), ("f1", "add_to_cart"), ("f2", "login"), ("f1", "purchase"),
+        ])
+    ])
+
+    day = "from_date=2025-12-01&to_date=2025-12-01"
+    resp = client.get(f"/stats/funnel?steps=login,add_to_cart,purchase&{day}&within=1h")
+    assert resp.status_code == 200
+    assert [step["users"] for step in resp.json()["steps"]] == [2, 1, 1]
+
+    resp = client.get(f"/stats/funnel?steps=login&{day}")
+    assert resp.status_code == 400
+    resp = client.get(f"/stats/funnel?steps=login,purchase&{day}&within=soon")
+    assert resp.status_code == 400
+    for within in ("91d", "3000000d", "99999999999999999999s"):
+        resp = client.get(f"/stats/funnel?steps=login,purchase&{day}&within={within}")
+        assert resp.status_code == 400
@@ -0,0 +1,43 @@
+import random
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from app.heavy_hitters import SpaceSaving
+from app.ingest import insert_events_batch
+
+
+def test_merged_summaries_bound_true_counts():
+    rng = random.Random(7)
+    days = [Counter(f"sku{int(rng.paretovariate(1.2))}" for _ in range(5000)) for _ in range(5)]
+    exact = sum(days, Counter())
+
+    merged = SpaceSaving(capacity=50)
+    for counts in days:
+        merged.merge(SpaceSaving.from_bytes(SpaceSaving.from_counts(counts, capacity=50).to_bytes()))
+
+    assert merged.total == sum(exact.values())
+    for value, count, error in merged.top(50):
+        assert count - error <= exact[value] <= count
+    for value, count in exact.items():
+        if value not in merged.counters:
+            assert count <= merged.max_error()
+    assert [value for value, _, _ in merged.top(3)] == [value for value, _ in exact.most_common(3)]
+
+
+def test_top_values_endpoint(client, db_session):
+    insert_events_batch(db_session, [
+        dict(event_id=str(uuid.uuid4()), occurred_at=datetime(2025, 12, 15, 8), user_id=f"tv{i}",
+             event_type="view_item", properties={"item_id": item_id, "country": "PL"})
+        for i, item_id in enumerate(["SKU1", "SKU2", "SKU1", "SKU3", "SKU1", "SKU2"])
+    ])
+
+    day = "from_date=2025-12-15&to_date=2025-12-15"
+    approx = client.get(f"/stats/top-values?property=item_id&{day}&limit=2").json()
+    exact = client.get(f"/stats/top-values?property=item_id&{day}&limit=2&exact=true").json()
+    expected = [{"value": "SKU1", "count": 3, "error": 0}, {"value": "SKU2", "count": 2, "error": 0}]
+    assert approx["values"] == exact["values"] == expected
+    assert approx["total"] == exact["total"] == 6
+
+    assert client.get(f"/stats/top-values?property=page&{day}").status_code == 400
+    assert client.get(f"/stats/top-values?property=page&{day}&exact=true").status_code == 200
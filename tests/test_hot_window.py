@@ -0,0 +1,88 @@
+from datetime import date
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.hot_window import HotWindow, _parse_snapshot, _visible
+
+DAY1, DAY2, DAY3 = date(2025, 10, 20), date(2025, 10, 21), date(2025, 10, 22)
+
+
+def _window():
+    window = HotWindow(days=3)
+    window._add_rows(DAY1, [(0, "u1", "login", "UA"), (0, "u2", "login", "PL"), (0, "u1", "view", "UA")],
+                     {"u1": DAY1, "u2": DAY1})
+    window._add_rows(DAY2, [(0, "u1", "view", "UA"), (0, "u3", "view", "")], {"u3": DAY2})
+    window._add_rows(DAY3, [(0, "u2", "login", "PL")], {})
+    window.ready = True
+    return window
+
+
+def test_hot_window_matches_rollup_semantics():
+    window = _window()
+
+    assert window.dau(DAY1, DAY3) == [(DAY1, 2), (DAY2, 2), (DAY3, 1)]
+    assert window.dau(DAY1, DAY3, "UA") == [(DAY1, 1), (DAY2, 1)]
+    assert window.dau(DAY1, DAY3, "DE") == []
+    assert window.top_events(DAY1, DAY3, 10) == [("login", 3), ("view", 3)]
+    assert window.retention(DAY1, 2) == (2, [1, 1])
+    assert window.retention(DAY2, 1) == (1, [0])
+    assert window.dau(DAY1, date(2025, 10, 23)) is None
+
+
+def test_rows_visible_in_load_snapshot_are_skipped():
+    snapshot = _parse_snapshot("100:105:101,103")
+
+    assert [xid for xid in range(98, 107) if _visible(xid, snapshot)] == [98, 99, 100, 102, 104]
+
+
+def test_users_leaving_the_window_are_pruned():
+    window = _window()
+    window._add_rows(DAY1, [(0, "gone", "login", "DE")], {"gone": DAY1})
+    window._columns.pop(DAY1)
+    window._prune_users()
+
+    assert window._users.values == ["u1", "u2", "u3"]
+    assert window.dau(DAY2, DAY3) == [(DAY2, 2), (DAY3, 1)]
+    assert window.dau(DAY2, DAY3, "UA") == [(DAY2, 1)]
+    assert window._first_seen[window._users.codes["u3"]] == DAY2.toordinal()
+
+
+def test_more_than_int16_event_types():
+    window = HotWindow(days=1)
+    window._add_rows(DAY1, [(0, "u1", f"type{i}", f"c{i}") for i in range(40000)], {})
+    window.ready = True
+
+    assert window.top_events(DAY1, DAY1, 1) == [("type0", 1)]
+    assert window.info()["dictionary_bytes"] > 0
+
+
+def test_unexpected_error_marks_window_not_ready(monkeypatch):
+    import asyncio
+    from app import hot_window
+
+    window = HotWindow(days=1)
+    loads = []
+
+    class FakeRedis:
+        async def xrevrange(self, *args, **kwargs):
+            return []
+
+    async def roll(session_factory):
+        loads.append(window.ready)
+        if len(loads) == 1:
+            window.ready = True
+            raise KeyError("rows")
+        raise asyncio.CancelledError
+
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(hot_window, "get_async_redis", lambda: FakeRedis())
+    monkeypatch.setattr(hot_window.asyncio, "sleep", no_sleep)
+    monkeypatch.setattr(window, "_roll", roll)
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(window.run(None))
+    assert loads == [False, False]
+    assert window.stats["errors"] == 1
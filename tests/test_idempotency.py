@@ -25,3 +25,50 @@ def test_event_idempotency(db_session):
 
     events = db_session.query(Event).filter_by(event_id=event_id).all()
     assert len(events) == 1
+
+
+def test_event_id_dedup_across_partitions(db_session):
+    from app.ingest import insert_events_batch
+
+    event_id = str(uuid.uuid4())
+    first = {"event_id": event_id, "occurred_at": datetime(2025, 1, 15), "user_id": "u1", "event_type": "click"}
+    retry = {**first, "occurred_at": datetime(2025, 3, 15)}
+
+    assert insert_events_batch(db_session, [first]) == 1
+    assert insert_events_batch(db_session, [retry, first]) == 0
+
+    assert db_session.query(Event).filter_by(event_id=uuid.UUID(event_id)).count() == 1
+
+
+def test_rolled_back_partition_is_not_cached(db_session):
+    from sqlalchemy import text
+    from app import partitions
+    from app.ingest import insert_events_batch
+
+    day = datetime(2026, 2, 10)
+    name = partitions.partition_name(partitions.partition_bounds(day.date())[0])
+    partitions.ensure_partitions(db_session, [day.date()])
+    db_session.rollback()
+    assert partitions.partition_bounds(day.date())[0] not in partitions._known_partitions
+
+    event = {"event_id": str(uuid.uuid4()), "occurred_at": day, "user_id": "u1", "event_type": "click"}
+    assert insert_events_batch(db_session, [event]) == 1
+    assert db_session.execute(text("SELECT count(*) FROM " + name)).scalar() == 1
+
+
+def test_detach_releases_event_ids(db_session):
+    from sqlalchemy import text
+    from app.ingest import insert_events_batch
+    from app.models import EventId
+    from app.partitions import detach_partitions_before
+
+    old = {"event_id": str(uuid.uuid4()), "occurred_at": datetime(2020, 3, 5), "user_id": "u1", "event_type": "click"}
+    kept = {"event_id": str(uuid.uuid4()), "occurred_at": datetime(2020, 4, 5), "user_id": "u1", "event_type": "click"}
+    assert insert_events_batch(db_session, [old, kept]) == 2
+
+    detached = detach_partitions_before(db_session, datetime(2020, 4, 1).date(), drop=True)
+
+    assert len(detached) == 1
+    assert {str(row.event_id) for row in db_session.query(EventId)} == {kept["event_id"]}
+    assert insert_events_batch(db_session, [old]) == 1
+    assert db_session.execute(text("SELECT count(*) FROM events WHERE user_id = 'u1'")).scalar() == 2
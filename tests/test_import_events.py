@@ -0,0 +1,92 @@
+import csv
+import uuid
+from datetime import datetime
+
+from import_events import split_chunks, read_chunk
+
+SAMPLE_CSV = "data/events_sample.csv"
+
+
+def test_byte_range_chunks_cover_every_row_once():
+    chunks = split_chunks([SAMPLE_CSV], chunk_bytes=100_000)
+    assert len(chunks) > 1
+
+    rows = [row for chunk in chunks for row in read_chunk(*chunk)]
+    with open(SAMPLE_CSV, newline='', encoding='utf-8') as csvfile:
+        assert rows == list(csv.DictReader(csvfile))
+
+
+def test_fast_and_normal_import_store_the_same_utc_time(tmp_path, monkeypatch, db_session):
+    import import_events
+    from conftest import TestingSessionLocal, engine
+    from sqlalchemy import select
+    from app.models import Event
+
+    monkeypatch.setattr(import_events, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(import_events, "engine", engine)
+
+    ids = {}
+    for mode in ("normal", "fast"):
+        ids[mode] = str(uuid.uuid4())
+        path = tmp_path / f"{mode}.csv"
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["event_id", "occurred_at", "user_id", "event_type", "properties_json"])
+            writer.writerow([ids[mode], "2025-08-21T01:30:00+03:00", "tz", "login", '{"country":"UA"}'])
+        if mode == "normal":
+            import_events.import_events(str(path))
+        else:
+            import_events.import_chunk((str(path), 0, None))
+
+    stored = dict(db_session.execute(select(Event.event_id, Event.occurred_at)).all())
+    assert stored[uuid.UUID(ids["normal"])] == stored[uuid.UUID(ids["fast"])] == datetime(2025, 8, 20, 22, 30)
+
+
+def test_copy_path_rollups_match_row_path(tmp_path, monkeypatch, db_session):
+    import import_events
+    from conftest import TestingSessionLocal, engine
+    from sqlalchemy import text
+    from app.heavy_hitters import SpaceSaving
+
+    monkeypatch.setattr(import_events, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(import_events, "engine", engine)
+    path = tmp_path / "sample.csv"
+    with open(SAMPLE_CSV, encoding="utf-8") as source, open(path, "w", encoding="utf-8") as f:
+        f.writelines(line for _, line in zip(range(301), source))
+
+    def rollups():
+        state = {
+            table: sorted(tuple(row) for row in db_session.execute(text(f"SELECT * FROM {table}")))
+            for table in ("daily_event_counts", "daily_user_activity", "user_first_seen", "daily_user_sketches")
+        }
+        state["daily_property_sketches"] = {
+            (day, key): SpaceSaving.from_bytes(counters).counters
+            for day, key, counters in db_session.execute(text("SELECT * FROM daily_property_sketches"))
+        }
+        db_session.execute(text(
+            "TRUNCATE TABLE events, event_ids, user_first_seen, daily_event_counts, daily_user_activity, "
+            "daily_user_sketches, daily_property_sketches CASCADE"
+        ))
+        db_session.commit()
+        return state
+
+    assert import_events.import_chunk((str(path), 0, None)) == (300, 300, 0)
+    copied = rollups()
+    import_events.import_events(str(path))
+    assert copied == rollups()
+    assert copied["daily_event_counts"]
+
+
+def test_files_with_multiline_records_stay_one_chunk(tmp_path):
+    path = tmp_path / "pretty.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["event_id", "occurred_at", "user_id", "event_type", "properties_json"])
+        for i in range(200):
+            writer.writerow([str(uuid.uuid4()), "2025-08-21T01:30:00", f"u{i}", "login", '{\n  "country": "UA"\n}'])
+
+    chunks = split_chunks([str(path)], chunk_bytes=1000)
+
+    assert chunks == [(str(path), 0, None)]
+    rows = list(read_chunk(*chunks[0]))
+    assert len(rows) == 200 and rows[-1]["properties_json"] == '{\n  "country": "UA"\n}'
@@ -4,4 +4,17 @@ def test_event_id_unique_index_exists(db_session):
     inspector = inspect(db_session.bind)
     pk_constraint = inspector.get_pk_constraint("events") or {}
     constrained_columns = pk_constraint.get("constrained_columns", [])
-    assert "event_id" in constrained_columns
\ No newline at end of file
+    assert "event_id" in constrained_columns
+
+def test_analytics_indexes_exist(db_session):
+    inspector = inspect(db_session.bind)
+    index_names = {index["name"] for index in inspector.get_indexes("events")}
+    assert {
+        "ix_events_occurred_at",
+        "ix_events_user_id_occurred_at",
+        "ix_events_event_type_occurred_at",
+        "ix_events_country_occurred_at",
+        "ix_events_session_id",
+        "ix_events_properties",
+    } <= index_names
+    assert "ix_events_country" not in index_names
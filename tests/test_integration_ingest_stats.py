@@ -1,25 +1,26 @@
 from datetime import datetime
 import uuid
-from app.models import Event
+from app.ingest import insert_events_batch, rebuild_rollups
+from app.models import DailyUserActivity, Event
 
 def test_ingest_and_get_dau(client, db_session):
 
     events = [
-        Event(
+        dict(
             event_id=str(uuid.uuid4()),
             occurred_at=datetime.utcnow(),
             user_id="u1",
             event_type="login",
             properties={"page": "home"}
         ),
-        Event(
+        dict(
             event_id=str(uuid.uuid4()),
             occurred_at=datetime.utcnow(),
             user_id="u2",
             event_type="login",
             properties={"page": "about"}
         ),
-        Event(
+        dict(
             event_id=str(uuid.uuid4()),
             occurred_at=datetime.utcnow(),
             user_id="u1",
@@ -28,8 +29,7 @@ def test_ingest_and_get_dau(client, db_session):
         )
     ]
 
-    db_session.add_all(events)
-    db_session.commit()
+    insert_events_batch(db_session, events)
 
     today = datetime.utcnow().date().isoformat()
     resp = client.get(f"/stats/dau?from_date={today}&to_date={today}")
@@ -39,3 +39,93 @@ def test_ingest_and_get_dau(client, db_session):
     print("Events in response:", data)
     assert isinstance(data, list)
     assert data[0]["dau"] == 2
+
+
+def test_rollups_ignore_duplicates(client, db_session):
+    event = dict(
+        event_id=str(uuid.uuid4()),
+        occurred_at=datetime(2025, 10, 20, 10),
+        user_id="u1",
+        event_type="login",
+        properties={"country": "UA"}
+    )
+
+    assert insert_events_batch(db_session, [event]) == 1
+    assert insert_events_batch(db_session, [event]) == 0
+
+    resp = client.get("/stats/top-events?from_date=2025-10-20&to_date=2025-10-20")
+    assert resp.json() == [{"event_type": "login", "count": 1}]
+
+    resp = client.get("/stats/dau?from_date=2025-10-20&to_date=2025-10-20&country=UA")
+    assert resp.json() == [{"day": "2025-10-20", "dau": 1}]
+
+
+def test_non_string_country_is_keyed_alike_everywhere(client, db_session):
+    insert_events_batch(db_session, [
+        dict(event_id=str(uuid.uuid4()), occurred_at=datetime(2025, 12, 16, 8), user_id=f"nc{i}",
+             event_type="view_item", properties={"country": country})
+        for i, country in enumerate([380, True, {"code": "UA"}])
+    ])
+    expected = {"380", "true", '{"code": "UA"}'}
+
+    assert {row.country for row in db_session.query(Event.country)} == expected
+    assert {row.country for row in db_session.query(DailyUserActivity.country)} == expected
+    resp = client.get("/stats/top-values?property=country&from_date=2025-12-16&to_date=2025-12-16")
+    assert {v["value"] for v in resp.json()["values"]} == expected
+
+    rebuild_rollups(db_session)
+    db_session.commit()
+    assert {row.country for row in db_session.query(DailyUserActivity.country)} == expected
+
+
+def test_property_filters(client, db_session):
+    def event(user_id, event_type, properties):
+        return dict(event_id=str(uuid.uuid4()), occurred_at=datetime(2025, 11, 3, 12), user_id=user_id,
+                    event_type=event_type, properties=properties)
+
+    insert_events_batch(db_session, [
+        event("p1", "purchase", {"country": "PL", "session_id": "s1", "payment_method": "card", "items": 2}),
+        event("p2", "purchase", {"country": "PL", "session_id": "s2", "payment_method": "paypal", "items": 1}),
+        event("p3", "login", {"country": "DE", "session_id": "s3"}),
+    ])
+
+    day = "from_date=2025-11-03&to_date=2025-11-03"
+    resp = client.get(f"/stats/top-events?{day}&prop.payment_method=card")
+    assert resp.json() == [{"event_type": "purchase", "count": 1}]
+
+    resp = client.get(f"/stats/dau?{day}&prop.country=PL&prop.items=1")
+    assert resp.json() == [{"day": "2025-11-03", "dau": 1}]
+
+    resp = client.get(f"/stats/active-users?{day}&prop.session_id=s3")
+    assert resp.json()["active_users"] == 1
+
+    resp = client.get("/stats/retention?start_date=2025-11-03&windows=1&prop.country=DE")
+    assert resp.json()["cohort_size"] == 1
+
+    resp = client.get(f"/stats/dau?{day}&prop.items=2&approx=true")
+    assert resp.status_code == 400
+
+
+def test_stats_batch(client, db_session):
+    insert_events_batch(db_session, [
+        dict(event_id=str(uuid.uuid4()), occurred_at=datetime(2025, 11, 5, 9), user_id=user_id,
+             event_type=event_type, properties={"country": "UA", "plan": "pro"})
+        for user_id, event_type in [("b1", "login"), ("b1", "purchase"), ("b2", "login")]
+    ])
+
+    day = {"from_date": "2025-11-05", "to_date": "2025-11-05"}
+    resp = client.post("/stats/batch", json=[
+        {"query": "dau", "params": {**day, "prop.plan": "pro"}},
+        {"query": "active-users", "params": {**day, "prop.plan": "pro"}},
+        {"query": "top-events", "params": {**day, "prop.plan": "pro", "limit": 1}},
+        {"query": "dau", "params": {**day, "country": "UA"}},
+        {"query": "retention", "params": {"start_date": "2025-11-05", "windows": 0}},
+    ])
+    assert resp.status_code == 200
+
+    results = resp.json()
+    assert results[0]["result"] == [{"day": "2025-11-05", "dau": 2}]
+    assert results[1]["result"]["active_users"] == 2
+    assert results[2]["result"] == [{"event_type": "login", "count": 2}]
+    assert results[3]["result"] == [{"day": "2025-11-05", "dau": 2}]
+    assert results[4]["status"] == 400
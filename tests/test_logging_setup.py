@@ -0,0 +1,31 @@
+import json
+import logging
+from app.logging_setup import JsonFormatter, SamplingFilter
+
+
+def _record(msg, *args, level=logging.INFO):
+    return logging.LogRecord("events_api", level, __file__, 1, msg, args, None)
+
+
+def test_json_formatter_escapes_message_and_keeps_extras():
+    record = _record('user said "hi" %s', "\\o/")
+    record.events = 3
+
+    data = json.loads(JsonFormatter().format(record))
+
+    assert data["message"] == 'user said "hi" \\o/'
+    assert data["logger"] == "events_api"
+    assert data["events"] == 3
+
+
+def test_rate_limit_counts_suppressed_records_and_passes_warnings():
+    sampling = SamplingFilter(per_second=2)
+
+    passed = [sampling.filter(_record("batch")) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert sampling.filter(_record("redis down", level=logging.WARNING))
+
+    sampling._tokens = 1
+    record = _record("batch")
+    assert sampling.filter(record)
+    assert record.suppressed == 3
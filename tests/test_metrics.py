@@ -0,0 +1,25 @@
+import uuid
+
+
+def _sample(body, name, **labels):
+    prefix = name + "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+    for line in body.splitlines():
+        if line.startswith(prefix + " "):
+            return float(line.split()[-1])
+    return 0.0
+
+
+def test_metrics_count_rejected_events(client):
+    before = _sample(client.get("/metrics").text, "events_rejected_total", endpoint="batch")
+
+    events = [
+        {"event_id": "not-a-uuid", "occurred_at": "2025-01-01T00:00:00", "user_id": "u1", "event_type": "a"},
+        {"event_id": str(uuid.uuid4()), "occurred_at": "2025-01-01T00:00:00", "user_id": "", "event_type": "a"},
+        {"event_id": str(uuid.uuid4()), "occurred_at": "2025-01-01T00:00:00", "user_id": "u2", "event_type": "a"},
+    ]
+    assert client.post("/events/", json=events).status_code == 422
+    assert client.get("/events/export?from_date=2025-01-01&to_date=2025-01-01&gzip=maybe").status_code == 422
+
+    body = client.get("/metrics").text
+    assert _sample(body, "events_rejected_total", endpoint="batch") == before + 2
+    assert "http_request_duration_seconds_count" in body
@@ -0,0 +1,36 @@
+import asyncio
+from app.ratelimit import RateLimit, TokenBucketLimiter
+
+
+class FakeBucket:
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.calls = 0
+
+    async def __call__(self, keys, args):
+        self.calls += 1
+        capacity, per_second, requested = args
+        granted = min(requested, self.tokens)
+        self.tokens -= granted
+        return [granted, self.tokens, 0 if granted else 1000 / per_second]
+
+
+def test_local_lease_cuts_redis_calls_and_denies_when_empty(monkeypatch):
+    limiter = TokenBucketLimiter(local_batch=5, lease_seconds=60)
+    bucket = FakeBucket(tokens=7)
+    monkeypatch.setattr(limiter, "_bucket_script", lambda: bucket)
+    limit = RateLimit("events", capacity=7, per_second=2)
+
+    async def run():
+        return [await limiter.acquire(limit, "ip:1.2.3.4") for _ in range(8)]
+
+    decisions = asyncio.run(run())
+
+    assert [d.allowed for d in decisions] == [True] * 7 + [False]
+    assert bucket.calls == 3
+    assert decisions[-1].headers() == {
+        "X-RateLimit-Limit": "7",
+        "X-RateLimit-Remaining": "0",
+        "Retry-After": "1",
+    }
@@ -0,0 +1,55 @@
+from datetime import datetime
+import uuid
+from app.ingest import insert_events_batch
+
+
+def make_event(user_id, occurred_at):
+    return {
+        "event_id": str(uuid.uuid4()),
+        "occurred_at": occurred_at,
+        "user_id": user_id,
+        "event_type": "login",
+        "properties": {},
+    }
+
+
+def test_retention_curve(client, db_session):
+    insert_events_batch(db_session, [
+        make_event("u1", datetime(2025, 10, 20, 10)),
+        make_event("u2", datetime(2025, 10, 20, 11)),
+        make_event("u3", datetime(2025, 10, 19, 11)),
+        make_event("u1", datetime(2025, 10, 21, 9)),
+        make_event("u1", datetime(2025, 10, 21, 18)),
+        make_event("u2", datetime(2025, 10, 23, 9)),
+        make_event("u3", datetime(2025, 10, 21, 9)),
+    ])
+
+    resp = client.get("/stats/retention?start_date=2025-10-20&windows=3")
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "start_date": "2025-10-20",
+        "cohort_size": 2,
+        "retention": [
+            {"day": 1, "returning_users": 1},
+            {"day": 2, "returning_users": 0},
+            {"day": 3, "returning_users": 1},
+        ],
+    }
+
+
+def test_retention_matrix(client, db_session):
+    insert_events_batch(db_session, [
+        make_event("u1", datetime(2025, 10, 20, 10)),
+        make_event("u2", datetime(2025, 10, 21, 11)),
+        make_event("u3", datetime(2025, 10, 21, 12)),
+        make_event("u1", datetime(2025, 10, 21, 9)),
+        make_event("u2", datetime(2025, 10, 22, 9)),
+        make_event("u3", datetime(2025, 10, 23, 9)),
+    ])
+
+    resp = client.get("/stats/retention-matrix?from_date=2025-10-20&to_date=2025-10-21&windows=2")
+    assert resp.status_code == 200
+    assert resp.json()["cohorts"] == [
+        {"cohort": "2025-10-20", "cohort_size": 1, "retention": [1, 0]},
+        {"cohort": "2025-10-21", "cohort_size": 2, "retention": [1, 1]},
+    ]
@@ -0,0 +1,35 @@
+import json
+import uuid
+from types import SimpleNamespace
+
+from app import api
+from app.fast_ingest import MAX_LINE_BYTES
+
+
+def _line(i):
+    return json.dumps({
+        "event_id": str(uuid.uuid4()), "occurred_at": "2025-10-20T10:00:00", "user_id": f"s{i}", "event_type": "login"
+    })
+
+
+def test_stream_rejects_other_content_types(client):
+    resp = client.post("/events/stream", content=_line(0), headers={"Content-Type": "application/json"})
+    assert resp.status_code == 415
+
+
+def test_aborted_stream_queues_accepted_events(client, monkeypatch):
+    dispatched = []
+
+    def fake_delay(events):
+        dispatched.extend(events)
+        return SimpleNamespace(id=f"task-{len(dispatched)}")
+
+    monkeypatch.setattr(api.insert_events_task, "delay", fake_delay)
+    body = "\n".join([_line(i) for i in range(3)] + ["x" * (MAX_LINE_BYTES + 1)])
+
+    resp = client.post("/events/stream", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert resp.status_code == 400
+    assert resp.json()["accepted"] == resp.json()["queued_events"] == 3
+    assert [event["user_id"] for event in dispatched] == ["s0", "s1", "s2"]
+    assert len(resp.json()["task_ids"]) == 1
@@ -0,0 +1,29 @@
+import uuid
+from datetime import datetime
+
+from app.ingest import insert_events_batch
+
+
+def test_user_timeline_pages_with_cursor(client, db_session):
+    user_id = f"timeline-{uuid.uuid4()}"
+    insert_events_batch(db_session, [
+        dict(event_id=str(uuid.uuid4()), occurred_at=datetime(2025, 12, 20, 10, minute), user_id=user_id,
+             event_type="login" if minute % 2 else "view_item", properties={"n": minute})
+        for minute in range(5)
+    ])
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2} | ({"before": cursor} if cursor else {})
+        page = client.get(f"/users/{user_id}/events", params=params).json()
+        seen += [event["properties"]["n"] for event in page["events"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [4, 3, 2, 1, 0]
+
+    page = client.get(f"/users/{user_id}/events", params={"event_type": "login"}).json()
+    assert [event["properties"]["n"] for event in page["events"]] == [3, 1]
+    assert page["next_cursor"] is None
+
+    assert client.get(f"/users/{user_id}/events", params={"before": "garbage"}).status_code == 400